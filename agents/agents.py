@@ -1,16 +1,103 @@
 from state import State
 import json
+import os
 import re
 from typing import Literal
+from langgraph.config import get_stream_writer
 from langgraph.graph import END
 from agents.prompts import PROMPTS
-from tools.emi_calculator_tool import calculate_emi
-from tools.credit_bureau import credit_score_api, pre_approved_amount_api
-from utils.user_profile import update_user_profile
-from llm import llm
+from tools.emi_calculator_tool import calculate_emi_details
+from tools.bureau_client import bureau_client
+from tools.offer_optimizer import PRODUCTS, optimize_offers, format_offers
+from utils.user_profile import llm_update_user_profile
+from utils.profile_extractor import extract_profile
+from utils.history import add_turn, latest_user_message
+from utils.history_summary import prompt_history
+from utils.rate_limiter import request_priority, PRIORITY_HIGH
+from agents.router import route_locally, router_stats
+from agents.quality_gate import DraftGate, should_critique, submit_background_critique, take_background_feedback
+from agents.feedback_agent import critique_response
+from llm import llm, cached_llm
 
 
-MAX_COUNT = 6
+MAX_COUNT = 6  # Message cap for simulated conversations; served sessions set their own via state["max_count"]
+
+# Tag on the LLM call that produces the customer-facing sales response, so graph streams
+# (stream_mode="messages") can pick out its tokens from all the other LLM calls
+FINAL_RESPONSE_TAG = "final_response"
+
+# One LLM call returns both the profile update and the routing decision when the local
+# extractor can't handle a message; set FUSED_MASTER=0 to use the separate two-call path
+FUSED_MASTER = os.getenv("FUSED_MASTER", "1") == "1"
+
+
+def fused_profile_and_route(user_latest_message: str, current_profile: dict):
+    """
+    Update the profile and pick the next agent with a single structured LLM response.
+    Returns (profile, action), or None if the response can't be used (caller falls back).
+    """
+    prompt = f"""You are the master agent for Tata Capital Loans. Do two things with the user's latest message.
+
+    1. Update the user's loan application profile.
+       - Only add or update fields if clear, explicit new information is present.
+       - Do not delete or overwrite previously filled fields unless there is definite new info.
+       - If you find user Id in the message be sure to add it as a field (integer "user_id").
+       - Use numbers for amounts in INR (e.g. 5 lakhs -> 500000) and months for "loan_tenure".
+    2. Decide which specialized agent should handle the message.
+       - If user asks about loan products, eligibility, interest rates, documents required, fees, processes, terms → 'search_agent'
+       - Otherwise (greetings, general questions, clarifications, negotiations, follow-ups) → 'sales_agent'
+
+    Current user profile: {json.dumps(current_profile, ensure_ascii=False)}
+    User's latest message: "{user_latest_message}"
+
+    Example:
+    Current: {{"loan_amount": 500000}}
+    Message: "My user ID is 2. What's the processing fee?"
+    Output: {{"profile": {{"loan_amount": 500000, "user_id": 2}}, "action": "search_agent", "reason": "asks about fees"}}
+
+    Respond with only this strict JSON object:
+    {{
+        "profile": {{ ...complete updated profile... }},
+        "action": "search_agent" | "sales_agent",
+        "reason": "brief explanation"
+    }}
+    """
+
+    response = cached_llm.invoke(prompt)
+    print("\n[MASTER AGENT FUSED]:", response.content)
+
+    match = re.search(r"\{.*\}", str(response.content), re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group())
+    except json.JSONDecodeError as e:
+        print("Invalid JSON in fused master response:", e)
+        return None
+
+    profile = data.get("profile")
+    action = data.get("action")
+    if not isinstance(profile, dict) or action not in ("search_agent", "sales_agent"):
+        return None
+    # Never let the LLM drop fields set by underwriting
+    for key in ("credit_score", "pre_approved_amount", "credit_score_checked"):
+        if key in current_profile:
+            profile[key] = current_profile[key]
+    return profile, action
+
+
+def emit_event(event: dict) -> None:
+    """Send an event to graph.stream(stream_mode="custom") consumers; a no-op outside a graph run."""
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer(event)
+
+
+def turn_limit_reached(state: State) -> bool:
+    """Whether the conversation has used up its messages (state["max_count"], else MAX_COUNT)."""
+    return state.get("count", 0) >= state.get("max_count", MAX_COUNT)
 
 
 def master_agent(state: State) -> State:
@@ -19,23 +106,30 @@ def master_agent(state: State) -> State:
     Returns updated state with 'action' field set for routing.
     """
     # Check max count
-    if state.get("count", 0) >= MAX_COUNT:
+    if turn_limit_reached(state):
         state["action"] = "end"
         return state
     
     # Initial greeting
-    if state["history"] == "":
+    if not state["history"]:
         greeting = "Hello! Welcome to Tata Capital loan assistant. How can I help you today?"
         print("Master Agent:", greeting)
-        state["history"] = "Loan assistant: " + greeting
+        add_turn(state["history"], "assistant", greeting)
         state["action"] = "user_agent"
         return state
 
     # Get latest user message
-    user_latest_message = state.get("history", "").split("User: ")[-1]
+    user_latest_message = latest_user_message(state["history"])
     
-    # Update user profile
-    user_profile = update_user_profile(user_latest_message, state["user_profile"])
+    # Update user profile: local extraction first, then fused (profile + routing) or plain LLM update
+    fused_action = None
+    user_profile = extract_profile(user_latest_message, state["user_profile"])
+    if user_profile is None and FUSED_MASTER:
+        fused = fused_profile_and_route(user_latest_message, state["user_profile"])
+        if fused:
+            user_profile, fused_action = fused
+    if user_profile is None:
+        user_profile = llm_update_user_profile(user_latest_message, state["user_profile"])
     state["user_profile"] = user_profile
 
     # PRIORITY CHECK: If we just got a user_id and haven't checked credit, do that FIRST
@@ -50,6 +144,20 @@ def master_agent(state: State) -> State:
             state["user_id"] = user_id
         return state
     
+    if fused_action:
+        state["action"] = fused_action
+        state["queries"] = []
+        print(f"  → Final routing (fused): {fused_action}")
+        return state
+
+    # Fast path: keyword rules / local model handle clear-cut messages without an LLM call
+    local_action = route_locally(user_latest_message)
+    if local_action:
+        state["action"] = local_action
+        state["queries"] = []
+        print(f"\n[MASTER AGENT] Local routing: {local_action} {router_stats()}")
+        return state
+
     # Simple routing decision - just decide WHICH agent, not the details
     routing_prompt = f"""You are a master routing agent for Tata Capital Loans.
     Analyze the user's message and decide which specialized agent should handle it.
@@ -68,7 +176,7 @@ def master_agent(state: State) -> State:
     }}
     """
 
-    response = llm.invoke(routing_prompt)
+    response = cached_llm.invoke(routing_prompt)
     print("\n[MASTER AGENT ROUTING]:", response.content)
 
     text = str(response.content)
@@ -100,7 +208,7 @@ def sales_agent(state: State) -> State:
     Sales agent - handles conversation with user.
     Focuses purely on sales, persuasion, and customer service.
     """
-    if state.get("count", 0) >= MAX_COUNT:
+    if turn_limit_reached(state):
         print("Max count reached in sales_agent")
         state["action"] = "end"
         return state
@@ -120,7 +228,7 @@ def sales_agent(state: State) -> State:
     system_prompt = PROMPTS['sales_agent']
     context = f"""
 Conversation History:
-{state['history']}
+{prompt_history(state)}
 
 User Profile:
 {json.dumps(state.get('user_profile', {}), indent=2)}
@@ -133,6 +241,14 @@ User Profile:
     
     if emi_info:
         context += f"\nEMI Calculation Result:\n{emi_info}\n"
+
+    # Affordable (indicative) offers computed locally from credit score, pre-approved limit and income
+    offers = optimize_offers(state["user_profile"])
+    loan_type = str(state["user_profile"].get("loan_type") or "").lower()
+    if loan_type and loan_type not in PRODUCTS:
+        context += f"\nNo rate card is available for {loan_type} loans: do not quote amounts, rates or EMIs for them; say an advisor will confirm the terms.\n"
+    elif offers:
+        context += f"\nFeasible Offers (indicative, computed from the user's credit score, pre-approved limit and income — present them as indicative and subject to final approval, open at the listed rate and never go below the floor rate):\n{format_offers(offers)}\n"
     
     # Sales agent focuses on conversation, not tool calling
     full_prompt = f"""{system_prompt}
@@ -149,31 +265,67 @@ Instructions:
 
 Generate your response now:"""
 
+    if not state["feedback"]:
+        # Feedback from a background critique of our previous reply (CRITIQUE_MODE=async)
+        previous_feedback = take_background_feedback(state)
+        if previous_feedback:
+            full_prompt += f"\nReviewer feedback on your previous reply (apply it where still relevant): {previous_feedback}"
+
     if (state["feedback"]):
         full_prompt += f"Take the following feedback into consideration: {state["feedback"]}"
 
-        response = llm.invoke(full_prompt)
-        
-        sales_response = response.content
-        print(f"\n[SALES AGENT]: {sales_response}\n")
-
-        state["feedback"] = None
-        state["search_results"] = ""  # Clear search results after use
-        state["emi_calculation"] = ""  # Clear EMI calculation after use
-        state["history"] += "\nLoan Assistant: " + sales_response
-        state["count"] = state.get("count", 0) + 1
-        state["action"] = "user_agent"  # Always go to user after sales response
+        # Stream the final response so the customer sees it from the first token
+        print("\n[SALES AGENT]: ", end="", flush=True)
+        sales_response = ""
+        with request_priority(PRIORITY_HIGH):
+            for chunk in llm.stream(full_prompt, config={"tags": [FINAL_RESPONSE_TAG]}):
+                sales_response += str(chunk.content)
+                print(chunk.content, end="", flush=True)
+        print("\n")
+        finish_sales_turn(state, sales_response)
     
     else:
-        response = llm.invoke(full_prompt)
-        
-        sales_response = response.content
-        print(f"\n[SALES AGENT]: Before Feedback - {sales_response}\n")
-        state["action"] = "feedback_agent"
+        # The draft streams to the customer sentence by sentence while it passes the quality gate;
+        # the customer is waiting on this call, so it goes ahead of queued background work
+        gate = DraftGate(full_prompt)
+        with request_priority(PRIORITY_HIGH):
+            for chunk in llm.stream(full_prompt):
+                piece = gate.feed(str(chunk.content))
+                if piece:
+                    emit_event({"type": "token", "text": piece})
+
+        sales_response = gate.text
+        state["last_response"] = sales_response
+
+        # Good drafts go straight to the customer; only weak ones get critique + rewrite
+        if should_critique(sales_response, full_prompt, bool(search_info)):
+            print(f"\n[SALES AGENT]: Before Feedback - {sales_response}\n")
+            if gate.released:
+                emit_event({"type": "retract"})
+            state["action"] = "feedback_agent"
+        else:
+            print(f"\n[SALES AGENT]: {sales_response}\n")
+            piece = gate.rest()
+            if piece:
+                emit_event({"type": "token", "text": piece})
+            finish_sales_turn(state, sales_response)
+            if not turn_limit_reached(state):  # no next turn would pick the critique up
+                submit_background_critique(state, critique_response)
 
     return state
 
 
+def finish_sales_turn(state: State, sales_response: str) -> None:
+    """Record the final sales response and hand the turn back to the user."""
+    state["feedback"] = None
+    state["last_response"] = sales_response
+    state["search_results"] = ""  # Clear search results after use
+    state["emi_calculation"] = ""  # Clear EMI calculation after use
+    add_turn(state["history"], "assistant", sales_response)
+    state["count"] = state.get("count", 0) + 1
+    state["action"] = "user_agent"  # Always go to user after sales response
+
+
 def emi_calculator_agent(state: State) -> State:
     """
     EMI Calculator agent - calculates EMI and updates state.
@@ -182,17 +334,17 @@ def emi_calculator_agent(state: State) -> State:
     
     loan_amount = user_profile.get("loan_amount")
     interest_rate = user_profile.get("interest_rate")
-    tenure = user_profile.get("tenure")
+    tenure = user_profile.get("loan_tenure") or user_profile.get("tenure")
     
     print(f"\n[EMI CALCULATOR] Inputs: Amount={loan_amount}, Rate={interest_rate}, Tenure={tenure}")
     
     try:
         # Call the EMI calculation tool
-        result = calculate_emi(float(loan_amount), float(interest_rate), int(tenure))
+        result = calculate_emi_details(float(loan_amount), float(interest_rate), int(tenure))
         
         emi_summary = f"""
 EMI Calculation Results:
-- Loan Amount: ₹{loan_amount:,}
+- Loan Amount: ₹{float(loan_amount):,.0f}
 - Interest Rate: {interest_rate}% p.a.
 - Tenure: {tenure} months
 - Monthly EMI: ₹{result.get('emi', 0):,.2f}
@@ -228,8 +380,10 @@ def underwriting_agent(state: State) -> State:
     print(f"\n[UNDERWRITING AGENT] Checking credit for user_id: {user_id}")
     
     try:
-        credit_score = credit_score_api(user_id)
-        pre_approved_amount = pre_approved_amount_api(user_id)
+        # One combined (cached, coalesced) bureau fetch for both values
+        bureau = bureau_client.fetch(user_id)
+        credit_score = bureau["credit_score"]
+        pre_approved_amount = bureau["pre_approved_amount"]
 
         # Update user profile with credit info
         state["user_profile"]["credit_score"] = credit_score
@@ -243,15 +397,12 @@ def underwriting_agent(state: State) -> State:
         print(f"[UNDERWRITING] Results: Credit Score={credit_score}, Pre-approved=₹{pre_approved_amount:,}")
         
         # Add to history so sales agent can reference it
-        underwriting_note = f"\n[System Note: Credit check completed - Score: {credit_score}, Pre-approved: ₹{pre_approved_amount:,}]"
-        state["history"] += underwriting_note
-
-        state["user_profile"] = update_user_profile(f"Credit Score: {credit_score}, Pre approved loan limit: {pre_approved_amount}", state["user_profile"])
+        add_turn(state["history"], "system", f"Credit check completed - Score: {credit_score}, Pre-approved: ₹{pre_approved_amount:,}")
         
     except Exception as e:
         print(f"[UNDERWRITING ERROR]: {e}")
         state["user_profile"]["credit_score_checked"] = True  # Mark as checked to avoid loops
-        state["history"] += f"\n[System Note: Unable to fetch credit information]"
+        add_turn(state["history"], "system", "Unable to fetch credit information")
 
     state["action"] = "sales_agent"  # Route to sales to discuss results
     return state
@@ -270,6 +421,6 @@ def route_after_master(state: State) -> Literal["user_agent", "sales_agent", "se
 
 def route_after_sales(state: State) -> Literal["user_agent", "feedback_agent", "__end__"]:
     """Route after sales agent - either to user or end"""
-    if state.get("count", 0) >= MAX_COUNT:
+    if turn_limit_reached(state):
         return "__end__"
     return state.get("action", "user_agent")
\ No newline at end of file
@@ -2,15 +2,13 @@ from state import State
 import json
 import re
 from llm import llm
+from utils.history_summary import prompt_history
 
-def feedback_agent(state: State) -> State:
+def critique_response(state: State, sales_response: str) -> str:
     """
-    Feedback agent - provides critique, identifies issues, and suggests improvements
-    for the latest response from the sales agent.
+    Ask the LLM to critique a sales agent response in the context of the conversation.
     """
-    # Extract the most recent sales agent response from the history
-    history = state.get("history", "")
-    sales_response = state.get("last_response", "")
+    history = prompt_history(state)
 
     # Optionally, access relevant user profile info, context, and previous queries as needed
     user_profile = state.get("user_profile", {})
@@ -44,7 +42,15 @@ Output your feedback now:
 
     # Call LLM for feedback analysis
     feedback_response = llm.invoke(feedback_prompt)
-    feedback = feedback_response.content
+    return feedback_response.content
+
+
+def feedback_agent(state: State) -> State:
+    """
+    Feedback agent - provides critique, identifies issues, and suggests improvements
+    for the latest response from the sales agent.
+    """
+    feedback = critique_response(state, state.get("last_response", ""))
     print(f"\n[FEEDBACK AGENT]: {feedback}\n")
 
     # Optionally, append feedback to state for agent improvement or further prompting
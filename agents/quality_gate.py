@@ -0,0 +1,185 @@
+import contextvars
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.rate_limiter import with_priority, PRIORITY_LOW
+
+# "always": every draft goes through feedback_agent and a rewrite (3 LLM calls per turn)
+# "gated":  drafts that pass the local checks are sent as-is (streamed while they keep passing);
+#           only failing drafts are critiqued
+# "async":  like "gated", but accepted drafts are also critiqued in the background and that
+#           feedback is applied when drafting the next turn
+CRITIQUE_MODE = os.getenv("CRITIQUE_MODE", "gated")
+
+MIN_WORDS = 8
+MAX_WORDS = 120
+MAX_QUESTIONS = 2
+
+NUMBER = re.compile(r"(\d[\d,]*(?:\.\d+)?)\s*(lakhs?|lacs?|crores?|cr\b|k\b)?", re.IGNORECASE)
+MULTIPLIERS = {"lakh": 1e5, "lac": 1e5, "crore": 1e7, "cr": 1e7, "k": 1e3}
+ASKS_CREDIT_SCORE = re.compile(r"(what|share|tell|provide)[^?.]*\bcredit score\b[^.]*\?", re.IGNORECASE)
+SENTENCE_END = re.compile(r"[.!?]+\s+|\n+")
+
+_lock = threading.Lock()
+GATE_STATS = {"accepted": 0, "critiqued": 0, "background_critiques": 0}
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("BACKGROUND_CRITIQUE_WORKERS", 4)))
+_pending_feedback = {}
+
+
+def _count(key: str) -> None:
+    with _lock:
+        GATE_STATS[key] += 1
+
+
+def gate_stats() -> dict:
+    with _lock:
+        stats = dict(GATE_STATS)
+    # An accepted draft skips the critique call and the rewrite call
+    stats["llm_calls_saved"] = 2 * stats["accepted"]
+    return stats
+
+
+def _numbers(text: str) -> set:
+    values = set()
+    for value, unit in NUMBER.findall(text):
+        number = float(value.replace(",", ""))
+        if unit:
+            number *= MULTIPLIERS.get(unit.lower().rstrip("s"), 1)
+        values.add(round(number, 2))
+    return values
+
+
+def assess_draft(draft: str, context: str, has_product_info: bool) -> list:
+    """
+    Cheap local checks on a sales draft. Returns the list of problems found (empty = good enough).
+
+    - length between MIN_WORDS and MAX_WORDS, at most MAX_QUESTIONS questions
+    - every significant number (amounts, rates) appears in the prompt context, i.e. nothing made up
+    - product information was available, so the reply should quote at least one figure
+    - never asks the customer for their credit score directly
+    """
+    problems = _prefix_problems(draft, _numbers(context))
+    words = len(draft.split())
+    if words < MIN_WORDS:
+        problems.append(f"too short ({words} words)")
+    if has_product_info and not _significant_numbers(draft):
+        problems.append("no figures quoted despite product information")
+    return problems
+
+
+def _significant_numbers(text: str) -> set:
+    return {n for n in _numbers(text) if n >= 100 or n != int(n)}
+
+
+def _prefix_problems(draft: str, context_numbers: set) -> list:
+    """The checks that, once failed by the start of a draft, stay failed however it continues."""
+    problems = []
+    words = len(draft.split())
+    if words > MAX_WORDS:
+        problems.append(f"too long ({words} words)")
+    if draft.count("?") > MAX_QUESTIONS:
+        problems.append(f"asks {draft.count('?')} questions")
+    if ASKS_CREDIT_SCORE.search(draft):
+        problems.append("asks for credit score directly")
+
+    unknown = _significant_numbers(draft) - context_numbers
+    if unknown:
+        problems.append(f"numbers not in context: {sorted(unknown)[:5]}")
+    return problems
+
+
+class DraftGate:
+    """
+    Applies the draft checks while a draft streams, so accepted drafts reach the customer token by token.
+
+    feed() returns the text that may be shown now: whole sentences, released only while the draft so far
+    passes the checks a continuation can't undo (length, questions, credit score, made-up numbers).
+    After a failure nothing more is released. rest() returns the unreleased tail once the complete
+    draft has been accepted by should_critique(); if it was rejected, `released` tells whether the
+    customer already saw part of it.
+    """
+
+    def __init__(self, context: str):
+        self.context_numbers = _numbers(context)
+        self.text = ""
+        self.released = 0
+        self.failed = CRITIQUE_MODE == "always"  # every draft gets rewritten, so none of it is shown
+
+    def feed(self, text: str) -> str:
+        self.text += text
+        if self.failed:
+            return ""
+        ends = [m.end() for m in SENTENCE_END.finditer(self.text, self.released)]
+        if not ends:
+            return ""
+        if _prefix_problems(self.text[:ends[-1]], self.context_numbers):
+            self.failed = True
+            return ""
+        piece, self.released = self.text[self.released:ends[-1]], ends[-1]
+        return piece
+
+    def rest(self) -> str:
+        piece, self.released = self.text[self.released:], len(self.text)
+        return piece
+
+
+def should_critique(draft: str, context: str, has_product_info: bool) -> bool:
+    """Decide whether a draft needs the feedback_agent loop, updating the gate counters."""
+    if CRITIQUE_MODE == "always":
+        _count("critiqued")
+        return True
+    problems = assess_draft(draft, context, has_product_info)
+    if problems:
+        print(f"[QUALITY GATE] Draft needs critique: {'; '.join(problems)}")
+        _count("critiqued")
+        return True
+    print(f"[QUALITY GATE] Draft accepted without critique {gate_stats()}")
+    _count("accepted")
+    return False
+
+
+def submit_background_critique(state, critique_fn) -> None:
+    """
+    In "async" mode, critique the response just sent while the customer reads it.
+    Needs a session_id to key the result; conversations without one are not critiqued in the background.
+    """
+    session_id = state.get("session_id")
+    if CRITIQUE_MODE != "async" or not session_id:
+        return
+    snapshot = dict(state)
+    snapshot["history"] = list(state["history"])
+    _count("background_critiques")
+    with _lock:
+        # Run in a copy of this context so the critique's spans keep the session/turn/node labels
+        _pending_feedback[session_id] = _executor.submit(
+            contextvars.copy_context().run,
+            with_priority(PRIORITY_LOW, critique_fn), snapshot, state.get("last_response", ""),
+        )
+
+
+def take_background_feedback(state):
+    """
+    Feedback from the previous turn's background critique, if it has finished (never blocks).
+    The entry is removed either way: a critique still running is stale by the next turn.
+    """
+    with _lock:
+        future = _pending_feedback.pop(state.get("session_id"), None)
+    if future is None or not future.done():
+        if future is not None:
+            future.cancel()
+        return None
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"[QUALITY GATE] Background critique failed: {e}")
+        return None
+
+
+def discard_background_feedback(session_id: str) -> None:
+    """Drop a session's pending critique, e.g. when the session ends or is evicted."""
+    with _lock:
+        future = _pending_feedback.pop(session_id, None)
+    if future is not None:
+        future.cancel()
@@ -0,0 +1,160 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Optional
+
+ROUTER_MODEL_PATH = os.getenv("ROUTER_MODEL_PATH", "router_model.json")
+MODEL_CONFIDENCE = float(os.getenv("ROUTER_MODEL_CONFIDENCE", 0.85))
+ROUTES = ("search_agent", "sales_agent")
+
+# Short acknowledgements / pleasantries never need product information
+SMALL_TALK = re.compile(
+    r"^\s*(ok(ay)?|k|thanks?( you)?|thank you( so much)?|sure|yes|yeah|yep|no|nope|great|fine|alright|"
+    r"cool|got it|hmm+|hi|hello|hey|good (morning|afternoon|evening)|perfect|sounds good|noted)[\s.!,]*$",
+    re.IGNORECASE,
+)
+# Product facts that live on the website
+PRODUCT_TOPICS = re.compile(
+    r"\b(interest rates?|rate of interest|roi|processing fees?|fees?|charges|documents?|documentation|"
+    r"eligib\w*|foreclos\w*|prepayment|part[- ]payment|penalt\w*|minimum salary|age limit|"
+    r"max(imum)? (loan )?amount|max(imum)? tenure|loan tenure|top[- ]up)\b",
+    re.IGNORECASE,
+)
+QUESTION = re.compile(r"\?|\b(what|which|how|is there|are there|do you|does|can i|tell me)\b", re.IGNORECASE)
+# Bargaining or personal follow-ups are the sales agent's job even when they mention rates/fees
+NEGOTIATION = re.compile(
+    r"\b(lower|reduce|better|discount|waive|negotiat\w*|match|cheaper|too high|best you can|"
+    r"can you do|my (emi|offer|rate)|for me|i can afford|apply|go ahead|proceed|user id)\b",
+    re.IGNORECASE,
+)
+
+_lock = threading.Lock()
+ROUTER_STATS = {"rules": 0, "model": 0, "llm": 0}
+
+
+def _count(source: str) -> None:
+    with _lock:
+        ROUTER_STATS[source] += 1
+
+
+def router_stats() -> dict:
+    with _lock:
+        stats = dict(ROUTER_STATS)
+    total = sum(stats.values())
+    stats["llm_calls_avoided"] = round((stats["rules"] + stats["model"]) / total, 3) if total else 0.0
+    return stats
+
+
+def _tokens(text: str):
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def rule_route(message: str) -> Optional[str]:
+    """Route by keyword rules; None when the rules are not confident."""
+    if SMALL_TALK.match(message):
+        return "sales_agent"
+    topic = PRODUCT_TOPICS.search(message)
+    negotiation = NEGOTIATION.search(message)
+    if topic and QUESTION.search(message) and not negotiation:
+        return "search_agent"
+    if negotiation and not topic:
+        return "sales_agent"
+    return None
+
+
+class NaiveBayesRouter:
+    """Multinomial naive Bayes over message tokens, stored as a small JSON file."""
+
+    def __init__(self, log_priors: dict, log_likelihoods: dict, unseen: dict):
+        self.log_priors = log_priors
+        self.log_likelihoods = log_likelihoods
+        self.unseen = unseen
+
+    @classmethod
+    def train(cls, examples, alpha: float = 1.0) -> "NaiveBayesRouter":
+        """Fit on (message, route) pairs."""
+        counts = {route: Counter() for route in ROUTES}
+        docs = Counter()
+        for text, route in examples:
+            counts[route].update(_tokens(text))
+            docs[route] += 1
+        vocab = set().union(*counts.values())
+        log_priors, log_likelihoods, unseen = {}, {}, {}
+        for route in ROUTES:
+            total = sum(counts[route].values()) + alpha * (len(vocab) + 1)
+            log_priors[route] = math.log((docs[route] + 1) / (sum(docs.values()) + len(ROUTES)))
+            log_likelihoods[route] = {t: math.log((c + alpha) / total) for t, c in counts[route].items()}
+            unseen[route] = math.log(alpha / total)
+        return cls(log_priors, log_likelihoods, unseen)
+
+    def predict(self, message: str):
+        """Return (route, probability)."""
+        tokens = _tokens(message)
+        scores = {
+            route: self.log_priors[route] + sum(self.log_likelihoods[route].get(t, self.unseen[route]) for t in tokens)
+            for route in ROUTES
+        }
+        best = max(scores, key=scores.get)
+        norm = sum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1.0 / norm
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump({"log_priors": self.log_priors, "log_likelihoods": self.log_likelihoods,
+                       "unseen": self.unseen}, f)
+
+    @classmethod
+    def load(cls, path: str) -> "NaiveBayesRouter":
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["log_priors"], data["log_likelihoods"], data["unseen"])
+
+
+def _load_model() -> Optional[NaiveBayesRouter]:
+    if not os.path.exists(ROUTER_MODEL_PATH):
+        return None
+    try:
+        return NaiveBayesRouter.load(ROUTER_MODEL_PATH)
+    except (OSError, KeyError, json.JSONDecodeError) as e:
+        print(f"[ROUTER] Could not load model from {ROUTER_MODEL_PATH}: {e}")
+        return None
+
+
+router_model = _load_model()
+
+
+def route_locally(message: str) -> Optional[str]:
+    """
+    Try to route a user message without the LLM.
+    Returns 'search_agent' / 'sales_agent', or None when the caller should fall back to the LLM.
+    """
+    route = rule_route(message)
+    if route:
+        _count("rules")
+        return route
+
+    if router_model is not None:
+        route, probability = router_model.predict(message)
+        if probability >= MODEL_CONFIDENCE:
+            _count("model")
+            return route
+
+    _count("llm")
+    return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the local routing model from labelled messages.")
+    parser.add_argument("examples", help="JSONL file with {\"message\": ..., \"route\": \"search_agent\" | \"sales_agent\"}")
+    parser.add_argument("--output", "-o", default=ROUTER_MODEL_PATH)
+    args = parser.parse_args()
+
+    with open(args.examples) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    NaiveBayesRouter.train([(r["message"], r["route"]) for r in rows]).save(args.output)
+    print(f"Trained on {len(rows)} examples -> {args.output}")
@@ -1,17 +1,87 @@
 from state import State
 import json
-from tools.tavily_tool import tavily_tool
+from tools.tavily_tool import cached_search, search_cache
+from tools.query_index import query_index
+from tools.knowledge_index import knowledge_search, select_passages
+from tools.product_facts import answer_from_facts
 import asyncio
 import re
+import threading
 from llm import llm
+from utils.history import latest_user_message
+from utils.tracing import tracer
 import time
+import os
 
-async def async_search(query):
-    return tavily_tool.invoke({"query": f"Find all detailed information related to {query} Tata Capital"})
+MAX_PARALLEL_SEARCHES = 5
 
-async def gather_searches(queries):
-    tasks = [asyncio.create_task(async_search(q)) for q in queries]
-    return await asyncio.gather(*tasks)
+# "local":  answer from the offline knowledge index (ingest_knowledge.py), Tavily only on a miss
+# "tavily": always search the web
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "local")
+SEARCH_STATS = {"local": 0, "web": 0}
+_stats_lock = threading.Lock()  # lookups run on worker threads
+
+
+def _count(backend: str) -> None:
+    with _stats_lock:
+        SEARCH_STATS[backend] += 1
+
+
+def search_stats() -> dict:
+    with _stats_lock:
+        return dict(SEARCH_STATS)
+
+
+def run_search(query, bypass_cache=False):
+    # One span per lookup; "cache" names where it was answered (knowledge_index, search_cache) or is None when live
+    with tracer.span("search", "lookup") as extra:
+        result = _lookup(query, bypass_cache)
+        extra["cache"] = result.get("source") if isinstance(result, dict) else None
+    return result
+
+
+def _lookup(query, bypass_cache=False):
+    if SEARCH_BACKEND == "local" and not bypass_cache:
+        result = knowledge_search(query)
+        if result is not None:
+            _count("local")
+            return result
+    _count("web")
+    return cached_search(f"Find all detailed information related to {query} Tata Capital", bypass_cache)
+
+
+async def async_search(query, semaphore, bypass_cache=False):
+    # The Tavily client is blocking, so run it on a worker thread to actually overlap requests
+    async with semaphore:
+        return await asyncio.to_thread(run_search, query, bypass_cache)
+
+async def gather_searches(queries, bypass_cache=False):
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_SEARCHES)
+    tasks = [asyncio.create_task(async_search(q, semaphore, bypass_cache)) for q in queries]
+    return await asyncio.gather(*tasks, return_exceptions=True)
+
+def build_summary_prompt(query, combined_content):
+    return f"""
+            Summarize the following search results about Tata Capital loans.
+            Focus on concrete, factual details such as:
+            - loan types
+            - interest rates
+            - eligibility
+            - required documents
+            - repayment terms
+            - processing fees or offers
+            - Anything else that is relevant.
+
+            Be concise but information-dense.
+            Use clear bullet points or short paragraphs.
+            DO NOT MAKE UP ANY INFORMATION WHATSOEVER.
+
+            Query: {query}
+            Results:
+            {combined_content}
+
+            Provide the summary directly — no JSON, no headings, just the text.
+            """
 
 def search_agent(state: State) -> State:
     """
@@ -19,8 +89,17 @@ def search_agent(state: State) -> State:
     """
     start = time.time()
 
-    user_latest_message = state.get("history", "").split("User: ")[-1]
+    user_latest_message = latest_user_message(state["history"])
     user_profile = state.get("user_profile", {})
+    bypass_cache = state.get("bypass_search_cache", False)
+
+    # Common product questions (rates, fees, tenure, documents, ...) come straight from the fact table
+    facts_answer = None if bypass_cache else answer_from_facts(user_latest_message, user_profile.get("loan_type"))
+    if facts_answer:
+        state["search_results"] = facts_answer
+        state["action"] = "sales_agent"
+        print(f"\n[SEARCH COMPLETE] Answered from the product fact table. (Time Taken: {round(time.time() - start, 4)} seconds)")
+        return state
         
     # Generate search queries based on user's question
     query_prompt = f"""You are a search query generator for Tata Capital loan information.
@@ -54,17 +133,47 @@ Respond in strict JSON format:
 
     print(f"[SEARCH AGENT] Generated queries: {queries}")
 
+    # Reuse summaries of near-duplicate queries answered earlier (in any session)
+    reused_summaries = []
+    if not bypass_cache:
+        pending = []
+        for query in queries:
+            match = query_index.lookup(query)
+            if match:
+                print(f"[SEARCH AGENT] Reusing summary of '{match['query']}' for '{query}' (similarity {match['similarity']})")
+                reused_summaries.append(f"=== {query} ===\n{match['summary']}\n")
+            else:
+                pending.append(query)
+        queries = pending
+
+    if not queries:
+        state["search_results"] = "\n\n".join(reused_summaries)
+        state["action"] = "sales_agent"
+        print(f"\n[SEARCH COMPLETE] All queries answered from previous summaries. (Time Taken: {round(time.time() - start, 2)} seconds)")
+        return state
+
     try:
-        all_results = asyncio.run(gather_searches(queries))
+        all_results = asyncio.run(gather_searches(queries, bypass_cache=bypass_cache))
     except Exception as e:
         print(f"[SEARCH AGENT] Search execution failed: {e}")
-        state["search_results"] = "Search temporarily unavailable."
+        state["search_results"] = "\n\n".join(reused_summaries) or "Search temporarily unavailable."
         state["action"] = "sales_agent"
         return state
 
-    summaries = []
+    if all_results and all(isinstance(r, Exception) for r in all_results):
+        print(f"[SEARCH AGENT] Search execution failed: {all_results[0]}")
+        state["search_results"] = "\n\n".join(reused_summaries) or "Search temporarily unavailable."
+        state["action"] = "sales_agent"
+        return state
+
+    summary_queries = []
+    summary_prompts = []
 
     for query, raw_result in zip(queries, all_results):
+        if isinstance(raw_result, Exception):
+            print(f"[SEARCH AGENT] Search failed for query '{query}': {raw_result}")
+            continue
+
         try:
             results_list = raw_result.get("results", [])
             if not results_list:
@@ -83,40 +192,34 @@ Respond in strict JSON format:
             # """
             # reranked = llm.invoke(rerank_prompt).content
 
-            # ---- Summarize top content ----
-            combined_content = "\n\n".join(
-                [f"Title: {r['title']}\n{r['content']}" for r in results_list[:3]]
-            )
+            # ---- Summarize only the passages that answer the query ----
+            combined_content = select_passages(query, results_list)
 
-            summary_prompt = f"""
-            Summarize the following search results about Tata Capital loans.
-            Focus on concrete, factual details such as:
-            - loan types
-            - interest rates
-            - eligibility
-            - required documents
-            - repayment terms
-            - processing fees or offers
-            - Anything else that is relevant.
-
-            Be concise but information-dense.
-            Use clear bullet points or short paragraphs.
-            DO NOT MAKE UP ANY INFORMATION WHATSOEVER.
-
-            Query: {query}
-            Results:
-            {combined_content}
-
-            Provide the summary directly — no JSON, no headings, just the text.
-            """
-
-            summary = llm.invoke(summary_prompt).content.strip()
-            summaries.append(f"=== {query} ===\n{summary}\n")
+            summary_queries.append(query)
+            summary_prompts.append(build_summary_prompt(query, combined_content))
 
         except Exception as e:
             print(f"[SEARCH AGENT] Error processing query '{query}': {e}")
             continue
 
+    # Summarize all queries concurrently instead of one llm.invoke after another
+    summaries = []
+    if summary_prompts:
+        responses = llm.batch(
+            summary_prompts,
+            config={"max_concurrency": MAX_PARALLEL_SEARCHES},
+            return_exceptions=True,
+        )
+        for query, response in zip(summary_queries, responses):
+            if isinstance(response, Exception):
+                print(f"[SEARCH AGENT] Error summarizing query '{query}': {response}")
+                continue
+            summary = response.content.strip()
+            query_index.add(query, summary)
+            summaries.append(f"=== {query} ===\n{summary}\n")
+
+    summaries = reused_summaries + summaries
+
     final_summary = "\n\n".join(summaries) if summaries else "No relevant loan information found."
     state["search_results"] = final_summary
     state["action"] = "sales_agent"
@@ -124,6 +227,7 @@ Respond in strict JSON format:
     time_taken = time.time() - start
 
     print(f"\n[SEARCH COMPLETE] Extracted structured loan data for {len(summaries)} queries. (Time Taken: {round(time_taken,  2)} seconds)")
+    print(f"[SEARCH CACHE] {search_cache.stats()} | similar-query reuse: {query_index.stats()} | backend: {search_stats()}")
     # print(final_summary)
 
     return state
@@ -1,26 +1,26 @@
 import dotenv
-from langchain_groq import ChatGroq
 from agents.prompts import USERS
 from state import State
 from langgraph.types import Command
 from typing import Literal
 from langgraph.graph import END
 from llm import llm
+from utils.history import add_turn, render_history
 
 dotenv.load_dotenv()
 
-llm = ChatGroq(model="llama-3.1-8b-instant")
-
 MAX_COUNT = 6
+DEFAULT_PERSONA = 2
 
 def user_agent(state: State) -> State:
     
-    messages = "Your role: " + USERS[2]['description'] + "\nHistory: " + state["history"] + "\nRespond appropriately as the user."
+    persona = USERS[state.get("persona_id") or DEFAULT_PERSONA]
+    messages = "Your role: " + persona['description'] + "\nHistory: " + render_history(state["history"]) + "\nRespond appropriately as the user."
     response = llm.invoke(messages)
 
     print("\n\nUser:", response.content)
 
-    state["history"] += "\nUser: " + response.content
+    add_turn(state["history"], "user", response.content)
     state["count"] = state.get("count", 0) + 1
 
     return state
\ No newline at end of file
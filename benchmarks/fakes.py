@@ -0,0 +1,170 @@
+import json
+import re
+import time
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+USER_SCRIPT = [
+    "Hi, I'm looking for a personal loan of 5 lakhs for my child's education.",
+    "Sure, my user ID is 2.",
+    "What is the interest rate and processing fee for a personal loan?",
+    "Can I get a tenure of 3 years? What would the EMI be?",
+    "That sounds a bit high. Can you do better on the rate?",
+    "Okay, thanks. Please go ahead with the application.",
+]
+
+SEARCH_KEYWORDS = ("interest", "rate", "fee", "document", "eligib", "tenure", "charges")
+
+
+def _prompt_text(prompt) -> str:
+    if isinstance(prompt, str):
+        return prompt
+    return "\n".join(str(getattr(m, "content", m)) for m in prompt)
+
+
+def _extract_json(text: str, marker: str) -> dict:
+    match = re.search(re.escape(marker) + r"\s*(\{.*?\})\s*\n", text, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        return json.loads(match.group(1))
+    except json.JSONDecodeError:
+        return {}
+
+
+class FakeChatModel:
+    """
+    Deterministic stand-in for ChatGroq. Recognises each agent's prompt and returns a canned,
+    well-formed response after `latency` seconds, so graph overhead can be measured offline.
+    """
+
+    model_name = "fake-llm"
+    temperature = 0
+
+    def __init__(self, latency: float = 0.0, tokens_per_second: float = 0.0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.calls = 0
+
+    def _update_profile(self, profile: dict, message: str) -> dict:
+        user_id = re.search(r"user id is (\d+)", message, re.IGNORECASE)
+        if user_id:
+            profile["user_id"] = int(user_id.group(1))
+        amount = re.search(r"(\d+)\s*lakh", message, re.IGNORECASE)
+        if amount:
+            profile["loan_amount"] = int(amount.group(1)) * 100000
+        return profile
+
+    def _respond(self, text: str) -> str:
+        if "Respond appropriately as the user" in text:
+            turn = text.count("\nUser: ")
+            return USER_SCRIPT[turn % len(USER_SCRIPT)]
+
+        if "master routing agent" in text:
+            message = text.split("User's latest message:", 1)[-1].split("\n", 1)[0].lower()
+            action = "search_agent" if any(k in message for k in SEARCH_KEYWORDS) else "sales_agent"
+            return json.dumps({"action": action, "reason": "fake routing"})
+
+        if "Do two things with the user's latest message" in text:
+            profile = self._update_profile(_extract_json(text, "Current user profile:"),
+                                           text.split("User's latest message:", 1)[-1].split("\n", 1)[0])
+            message = text.split("User's latest message:", 1)[-1].split("\n", 1)[0].lower()
+            action = "search_agent" if any(k in message for k in SEARCH_KEYWORDS) else "sales_agent"
+            return json.dumps({"profile": profile, "action": action, "reason": "fake fused routing"})
+
+        if "user profiles for loan applications" in text:
+            profile = _extract_json(text, "The current user profile is:")
+            message = text.split("The latest user message is:", 1)[-1].split("\n", 1)[0]
+            return json.dumps(self._update_profile(profile, message))
+
+        if "search query generator" in text:
+            return json.dumps({"queries": ["personal loan interest rates", "personal loan processing fees"]})
+
+        if "Summarize the following search results" in text:
+            return "- Personal loan interest rates from 10.99% p.a.\n- Processing fee up to 3.5% of the loan amount\n- Tenure 12 to 72 months"
+
+        if "running summary of a loan sales conversation" in text:
+            return "Customer wants a 5 lakh personal loan for education; user ID 2 shared; rates and fees discussed."
+
+        if "banking conversation analyst" in text:
+            return "Suggestion: Quote the exact interest rate range.\nIssue: The EMI for the requested tenure was not mentioned."
+
+        return "Based on your profile, we can offer a personal loan at 11.5% p.a. for 36 months. Shall I proceed?"
+
+    def _wait(self, content: str) -> None:
+        delay = self.latency
+        if self.tokens_per_second:
+            delay += len(content.split()) / self.tokens_per_second
+        if delay:
+            time.sleep(delay)
+
+    def invoke(self, prompt, config=None, **kwargs) -> AIMessage:
+        self.calls += 1
+        text = _prompt_text(prompt)
+        content = self._respond(text)
+        self._wait(content)
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": len(text) // 4,
+                "output_tokens": len(content) // 4,
+                "total_tokens": (len(text) + len(content)) // 4,
+            },
+        )
+
+    def batch(self, prompts, config=None, return_exceptions=False, **kwargs):
+        results = []
+        for prompt in prompts:
+            try:
+                results.append(self.invoke(prompt))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def stream(self, prompt, config=None, **kwargs):
+        content = self.invoke(prompt).content
+        for word in re.findall(r"\S+\s*", content):
+            yield AIMessageChunk(content=word)
+
+    def with_config(self, *args, **kwargs):
+        return self
+
+
+class FakeTavilySearch:
+    """Deterministic stand-in for TavilySearch returning two canned Tata Capital results."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def invoke(self, payload, config=None, **kwargs) -> dict:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        query = payload["query"] if isinstance(payload, dict) else str(payload)
+        page = (
+            "Tata Capital personal loans are available at interest rates starting from 10.99% p.a. "
+            "Processing fee is up to 3.5% of the loan amount plus GST. Loan tenure ranges from 12 to 72 months. "
+            "Documents required: KYC, last 3 months salary slips, 6 months bank statements."
+        )
+        return {
+            "query": query,
+            "answer": "Personal loan rates start at 10.99% p.a.",
+            "results": [
+                {
+                    "title": "Personal Loan Interest Rates | Tata Capital",
+                    "url": "https://www.tatacapital.com/personal-loan/interest-rate.html",
+                    "content": page[:160],
+                    "raw_content": page * 5,
+                    "score": 0.9,
+                },
+                {
+                    "title": "Personal Loan Fees & Charges | Tata Capital",
+                    "url": "https://www.tatacapital.com/personal-loan/fees-and-charges.html",
+                    "content": page[100:],
+                    "raw_content": page * 5,
+                    "score": 0.8,
+                },
+            ],
+        }
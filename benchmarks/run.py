@@ -0,0 +1,177 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Offline run: dummy keys so the real clients can be constructed, and a throwaway cache dir
+os.environ.setdefault("GROQ_API_KEY", "offline-benchmark")
+os.environ.setdefault("TAVILY_API_KEY", "offline-benchmark")
+os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="loan-bench-")
+
+from benchmarks.fakes import FakeChatModel, FakeTavilySearch
+from utils.clients import swap_clients
+from main import graph, new_conversation_state
+from agents.agents import master_agent, sales_agent, underwriting_agent
+from agents.feedback_agent import feedback_agent
+from agents.search_agent import search_agent
+from utils.user_profile import update_user_profile
+from utils.history import add_turn
+
+
+TRANSCRIPT = [
+    ("assistant", "Hello! Welcome to Tata Capital loan assistant. How can I help you today?"),
+    ("user", "Hi, I'm looking for a personal loan of 5 lakhs for my child's education."),
+    ("assistant", "Happy to help! Could you share your user ID so I can check your eligibility?"),
+    ("user", "What is the interest rate and processing fee for a personal loan?"),
+]
+PROFILE = {"user_id": 2, "loan_type": "personal", "loan_amount": 500000, "credit_score_checked": True,
+           "credit_score": 765, "pre_approved_amount": 850000}
+
+
+def base_state(**overrides):
+    """Benchmark state; live searches by default, pass bypass_search_cache=False for the cached production path."""
+    state = new_conversation_state(persona_id=2, session_id="bench")
+    history = []
+    for role, text in TRANSCRIPT:
+        add_turn(history, role, text)
+    state.update(history=history, user_profile=dict(PROFILE), user_id=2, bypass_search_cache=True)
+    state.update(overrides)
+    return state
+
+
+def node_cases():
+    """(name, callable, state factory) for every benchmarked node."""
+    return [
+        ("master_agent", master_agent, lambda: base_state()),
+        ("sales_agent_draft", sales_agent, lambda: base_state(feedback="")),
+        ("sales_agent_final", sales_agent, lambda: base_state(feedback="Suggestion: quote exact rates.")),
+        ("feedback_agent", feedback_agent, lambda: base_state(last_response="We offer 11.5% p.a.")),
+        ("search_agent", search_agent, lambda: base_state()),
+        # Production path: fact table, knowledge index and cached results reused across iterations
+        ("search_agent_cached", search_agent, lambda: base_state(bypass_search_cache=False)),
+        ("underwriting_agent", underwriting_agent,
+         lambda: base_state(user_profile={"user_id": 2, "loan_type": "personal"})),
+        ("update_user_profile",
+         lambda s: update_user_profile("My user ID is 2 and I need 5 lakhs", s["user_profile"]),
+         lambda: base_state()),
+    ]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples, llm_calls, search_calls, iterations):
+    return {
+        "iterations": iterations,
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3),
+        "llm_calls_per_iter": round(llm_calls / iterations, 2),
+        "search_calls_per_iter": round(search_calls / iterations, 2),
+    }
+
+
+def bench(fn, make_state, fake_llm, fake_search, iterations, warmup):
+    for _ in range(warmup):
+        fn(make_state())
+    llm_before, search_before = fake_llm.calls, fake_search.calls
+    samples = []
+    for _ in range(iterations):
+        state = make_state()
+        start = time.perf_counter()
+        fn(state)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, fake_llm.calls - llm_before, fake_search.calls - search_before, iterations)
+
+
+def run_conversation(state):
+    return graph.invoke(state, {"recursion_limit": 100})
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def run(iterations=50, warmup=3, llm_latency=0.0, search_latency=0.0, only=None):
+    fake_llm = FakeChatModel(latency=llm_latency)
+    fake_search = FakeTavilySearch(latency=search_latency)
+
+    cases = node_cases() + [
+        ("full_conversation", run_conversation, lambda: new_conversation_state(
+            persona_id=2, session_id="bench") | {"bypass_search_cache": True}),
+        ("full_conversation_cached", run_conversation, lambda: new_conversation_state(
+            persona_id=2, session_id="bench") | {"bypass_search_cache": False}),
+    ]
+    if only:
+        cases = [c for c in cases if c[0] in only]
+
+    results = {}
+    with swap_clients(llm=fake_llm, cached_llm=fake_llm, search=fake_search):
+        for name, fn, make_state in cases:
+            # Agents print heavily; keep that out of the timings and the report
+            with contextlib.redirect_stdout(io.StringIO()):
+                results[name] = bench(fn, make_state, fake_llm, fake_search,
+                                      max(1, iterations // 10) if name.startswith("full_conversation") else iterations,
+                                      warmup)
+
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "config": {"iterations": iterations, "warmup": warmup,
+                   "llm_latency_s": llm_latency, "search_latency_s": search_latency},
+        "benchmarks": results,
+    }
+
+
+def compare(report, baseline):
+    """Print mean latency change per benchmark against an earlier report."""
+    print(f"\n{'benchmark':<24}{'baseline ms':>14}{'current ms':>14}{'change':>10}")
+    for name, current in report["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if not previous:
+            print(f"{name:<24}{'-':>14}{current['mean_ms']:>14.3f}{'new':>10}")
+            continue
+        change = (current["mean_ms"] - previous["mean_ms"]) / previous["mean_ms"] * 100 if previous["mean_ms"] else 0.0
+        print(f"{name:<24}{previous['mean_ms']:>14.3f}{current['mean_ms']:>14.3f}{change:>+9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the loan assistant graph.")
+    parser.add_argument("--iterations", "-n", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per fake LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Simulated seconds per fake search")
+    parser.add_argument("--only", nargs="*", help="Run only these benchmarks")
+    parser.add_argument("--output", "-o", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run(args.iterations, args.warmup, args.llm_latency, args.search_latency, args.only)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+import argparse
+import csv
+import os
+import time
+from multiprocessing import Pool
+import numpy as np
+from tools.credit_bureau import bulk_bureau_lookup
+from tools.offer_optimizer import PRODUCTS, DEFAULT_PRODUCT, MAX_FOIR, rate_grid
+
+CHUNK_SIZE = 50000
+MIN_CREDIT_SCORE = 650
+
+OUTPUT_FIELDS = [
+    "customer_id", "eligible", "reason", "loan_type", "credit_score", "pre_approved_amount",
+    "offer_amount", "tenure_months", "rate", "floor_rate", "emi",
+]
+
+
+def _column(rows, *names, default=None):
+    """First non-empty value among `names` for every row, as a list."""
+    values = []
+    for row in rows:
+        value = default
+        for name in names:
+            if row.get(name) not in (None, ""):
+                value = row[name]
+                break
+        values.append(value)
+    return values
+
+
+def _as_float(values):
+    return np.array([np.nan if v in (None, "") else float(v) for v in values], dtype=float)
+
+
+def score_chunk(rows: list) -> list:
+    """
+    Eligibility and best offer for a chunk of customer rows, vectorized per loan type.
+    Bureau data comes from the file when present, otherwise from one bulk bureau lookup for the chunk.
+    """
+    n = len(rows)
+    ids = _column(rows, "customer_id", "user_id")
+    income = _as_float(_column(rows, "monthly_income", "income"))
+    existing_emi = np.nan_to_num(_as_float(_column(rows, "existing_emi", default=0)))
+    requested = _as_float(_column(rows, "requested_amount", "loan_amount"))
+    loan_types = [str(t).lower() if t else DEFAULT_PRODUCT for t in _column(rows, "loan_type")]
+
+    score = _as_float(_column(rows, "credit_score"))
+    pre_approved = _as_float(_column(rows, "pre_approved_amount"))
+    missing = [int(ids[i]) for i in range(n) if np.isnan(score[i]) and str(ids[i]).isdigit()]
+    if missing:
+        bureau = bulk_bureau_lookup(missing)
+        for i in range(n):
+            record = bureau.get(int(ids[i])) if str(ids[i]).isdigit() else None
+            if record and np.isnan(score[i]):
+                score[i] = record["credit_score"]
+                pre_approved[i] = record["pre_approved_amount"]
+
+    out = {
+        "offer_amount": np.zeros(n), "tenure_months": np.zeros(n, dtype=int), "rate": np.full(n, np.nan),
+        "floor_rate": np.full(n, np.nan), "emi": np.zeros(n),
+    }
+    budget = income * MAX_FOIR - existing_emi
+
+    for loan_type in set(loan_types) & PRODUCTS.keys():
+        type_idx = np.array([i for i, t in enumerate(loan_types) if t == loan_type])
+        product = PRODUCTS[loan_type]
+        tenures = np.asarray(list(product["tenures"]), dtype=float)
+        bands = product["rate_bands"]
+        band = np.select([score[type_idx] >= min_score for min_score, _, _ in bands], range(len(bands)),
+                         default=len(bands) - 1)
+
+        # Customers in one rate band share a rate grid; priced like optimize_offers: the largest amount
+        # any rate in the band can afford, opened at the highest rate that still affords it, on the
+        # tenure with the lowest opening EMI
+        for b in set(band.tolist()):
+            idx = type_idx[band == b]
+            rates = rate_grid(*bands[b][1:])
+            cap = np.fmin(np.nan_to_num(pre_approved[idx], nan=product["max_amount"]), product["max_amount"])
+            cap = np.fmin(cap, np.nan_to_num(requested[idx], nan=np.inf))
+            budget_b = np.nan_to_num(np.maximum(budget[idx], 0))
+
+            def affordable(rate):
+                # Max principal per (customer, tenure) at `rate`: EMI budget x annuity factor
+                r = rate / 1200
+                growth = np.power(1 + r, tenures)
+                amount = np.minimum(budget_b[:, None] * (growth - 1) / (r * growth), cap[:, None])
+                return np.floor(amount / 1000) * 1000
+
+            best_amount = affordable(rates[0]).max(axis=1)
+            open_rate = np.full((len(idx), len(tenures)), np.nan)
+            for rate in rates:
+                open_rate[affordable(rate) >= best_amount[:, None]] = rate
+
+            r = open_rate / 1200
+            growth = np.power(1 + r, tenures[None, :])
+            emi = np.nan_to_num(best_amount[:, None] * r * growth / (growth - 1), nan=np.inf)
+            best = np.argmin(emi, axis=1)
+            rows_b = np.arange(len(idx))
+
+            out["offer_amount"][idx] = best_amount
+            out["tenure_months"][idx] = tenures[best].astype(int)
+            out["rate"][idx] = open_rate[rows_b, best]
+            out["floor_rate"][idx] = rates[0]
+            out["emi"][idx] = np.round(emi[rows_b, best])
+
+    results = []
+    for i in range(n):
+        loan_type = loan_types[i]
+        if loan_type not in PRODUCTS:
+            reason = "no rate card for loan type"
+        elif np.isnan(score[i]):
+            reason = "no bureau record"
+        elif score[i] < MIN_CREDIT_SCORE:
+            reason = "credit score below minimum"
+        elif np.isnan(income[i]):
+            reason = "income missing"
+        elif requested[i] < PRODUCTS[loan_type]["min_amount"]:
+            reason = "below product minimum"
+        elif out["offer_amount"][i] < PRODUCTS[loan_type]["min_amount"]:
+            reason = "insufficient repayment capacity"
+        else:
+            reason = ""
+        eligible = reason == ""
+        results.append({
+            "customer_id": ids[i],
+            "eligible": eligible,
+            "reason": reason,
+            "loan_type": loan_type,
+            "credit_score": None if np.isnan(score[i]) else int(score[i]),
+            "pre_approved_amount": None if np.isnan(pre_approved[i]) else int(pre_approved[i]),
+            "offer_amount": int(out["offer_amount"][i]) if eligible else 0,
+            "tenure_months": int(out["tenure_months"][i]) if eligible else 0,
+            "rate": float(out["rate"][i]) if eligible else None,
+            "floor_rate": float(out["floor_rate"][i]) if eligible else None,
+            "emi": int(out["emi"][i]) if eligible else 0,
+        })
+    return results
+
+
+def read_chunks(path: str, chunk_size: int = CHUNK_SIZE):
+    """Yield lists of row dicts from a CSV or Parquet file without loading it whole."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+        return
+
+    with open(path, newline="") as f:
+        chunk = []
+        for row in csv.DictReader(f):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class ResultWriter:
+    """Streams result rows to CSV, or to Parquet (one row group per chunk) when the path ends in .parquet."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._parquet = path.endswith(".parquet")
+        self._writer = None
+        self._file = None
+
+    def write(self, rows: list) -> None:
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pylist(rows)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            self._writer.write_table(table)
+            return
+
+        if self._writer is None:
+            self._file = open(self.path, "w", newline="")
+            self._writer = csv.DictWriter(self._file, fieldnames=OUTPUT_FIELDS)
+            self._writer.writeheader()
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        if self._parquet and self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def run(input_path: str, output_path: str, workers: int = None, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Score every customer in input_path and write offers to output_path. Returns run totals."""
+    start = time.perf_counter()
+    totals = {"rows": 0, "eligible": 0}
+    writer = ResultWriter(output_path)
+    try:
+        with Pool(workers or os.cpu_count()) as pool:
+            # imap keeps output order and only holds a few chunks in memory at a time
+            for results in pool.imap(score_chunk, read_chunks(input_path, chunk_size)):
+                writer.write(results)
+                totals["rows"] += len(results)
+                totals["eligible"] += sum(r["eligible"] for r in results)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    totals["seconds"] = round(elapsed, 2)
+    totals["rows_per_second"] = round(totals["rows"] / elapsed) if elapsed else 0
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a customer file and pre-compute best loan offers.")
+    parser.add_argument("input", help="CSV or Parquet file with customer_id, monthly_income and optional "
+                                      "loan_type, requested_amount, existing_emi, credit_score, pre_approved_amount")
+    parser.add_argument("output", help="CSV or Parquet output path")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    print(run(args.input, args.output, args.workers, args.chunk_size))
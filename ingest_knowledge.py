@@ -0,0 +1,161 @@
+import argparse
+import os
+import re
+import time
+import urllib.request
+from collections import deque
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urldefrag, urlparse
+from tools.knowledge_index import build_index, KNOWLEDGE_INDEX_PATH
+from tools.product_facts import refresh_facts
+from tools.tavily_tool import TAVILY_CONFIG, search_cache
+
+SKIP_TAGS = {"script", "style", "noscript", "nav", "footer", "header", "svg", "form"}
+BLOCK_TAGS = {"p", "div", "section", "article", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "br", "table"}
+USER_AGENT = "loan-assistant-ingest/1.0"
+
+
+class PageParser(HTMLParser):
+    """Visible text (paragraph breaks at block elements), <title> and links of an HTML page."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self.links = []
+        self._parts = []
+        self._skip = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+        if tag in BLOCK_TAGS:
+            self._parts.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self._skip:
+            self._skip -= 1
+        elif tag == "title":
+            self._in_title = False
+        if tag in BLOCK_TAGS:
+            self._parts.append("\n\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data.strip()
+        elif not self._skip:
+            self._parts.append(data)
+
+    @property
+    def text(self) -> str:
+        text = re.sub(r"[ \t\r\f\v]+", " ", "".join(self._parts))
+        return re.sub(r"\n\s*\n(\s*\n)*", "\n\n", text).strip()
+
+
+def parse_html(html: str, url: str = "") -> dict:
+    parser = PageParser()
+    parser.feed(html)
+    return {"url": url, "title": parser.title, "text": parser.text, "links": parser.links}
+
+
+def allowed(url: str) -> bool:
+    """Same domain and exclusion rules as the Tavily search."""
+    host = urlparse(url).hostname or ""
+    if not any(host == d or host.endswith("." + d) for d in TAVILY_CONFIG["include_domains"]):
+        return False
+    return not any(url.startswith(prefix) for prefix in TAVILY_CONFIG["exclude_domains"])
+
+
+def crawl(seeds, max_pages: int = 200, delay: float = 0.5):
+    """Breadth-first crawl of product pages from the seed URLs, yielding parsed documents."""
+    queue, seen = deque(seeds), set(seeds)
+    fetched = 0
+    while queue and fetched < max_pages:
+        url = queue.popleft()
+        try:
+            request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+            with urllib.request.urlopen(request, timeout=15) as response:
+                if "html" not in response.headers.get("Content-Type", ""):
+                    continue
+                html = response.read().decode(response.headers.get_content_charset() or "utf-8", "replace")
+        except Exception as e:
+            print(f"[INGEST] Failed to fetch {url}: {e}")
+            continue
+        fetched += 1
+        page = parse_html(html, url)
+        yield page
+        for href in page["links"]:
+            link = urldefrag(urljoin(url, href))[0]
+            if link not in seen and allowed(link) and not re.search(r"\.(pdf|jpe?g|png|gif|zip)$", link, re.I):
+                seen.add(link)
+                queue.append(link)
+        time.sleep(delay)
+
+
+def load_snapshot(directory: str):
+    """Documents from a saved snapshot: *.html pages (parsed) and *.txt files (first line = URL)."""
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            with open(path, encoding="utf-8", errors="replace") as f:
+                content = f.read()
+            if name.endswith((".html", ".htm")):
+                yield parse_html(content, url=os.path.relpath(path, directory))
+            elif name.endswith(".txt"):
+                first, _, rest = content.partition("\n")
+                is_url = first.startswith("http")
+                yield {"url": first.strip() if is_url else name, "title": name, "text": rest if is_url else content}
+
+
+def load_search_cache():
+    """Pages already fetched by earlier Tavily searches (raw_content, else the snippet), one per URL."""
+    seen = set()
+    for _, response in search_cache.items():
+        for result in (response or {}).get("results", []):
+            url = result.get("url")
+            text = result.get("raw_content") or result.get("content")
+            if url and text and url not in seen:
+                seen.add(url)
+                yield {"url": url, "title": result.get("title", ""), "text": text}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local product knowledge index (BM25).")
+    parser.add_argument("--snapshot", help="Directory of saved .html/.txt product pages")
+    parser.add_argument("--crawl", nargs="*", metavar="URL", help="Seed URLs to crawl (same rules as the Tavily search)")
+    parser.add_argument("--max-pages", type=int, default=200)
+    parser.add_argument("--from-search-cache", action="store_true", help="Include pages from the Tavily search cache")
+    parser.add_argument("--output", "-o", default=KNOWLEDGE_INDEX_PATH)
+    args = parser.parse_args()
+
+    if not (args.snapshot or args.crawl or args.from_search_cache):
+        parser.error("give at least one of --snapshot, --crawl, --from-search-cache")
+
+    def documents():
+        seen = set()
+        sources = []
+        if args.snapshot:
+            sources.append(load_snapshot(args.snapshot))
+        if args.crawl:
+            sources.append(crawl(args.crawl, args.max_pages))
+        if args.from_search_cache:
+            sources.append(load_search_cache())
+        for source in sources:
+            for document in source:
+                if document["url"] in seen or not document["text"].strip():
+                    continue
+                seen.add(document["url"])
+                print(f"[INGEST] {document['url']}")
+                yield document
+
+    start = time.perf_counter()
+    pages = list(documents())
+    stats = build_index(pages, args.output)
+    print(f"[INGEST] Indexed {stats} into {args.output} in {time.perf_counter() - start:.1f}s")
+    print(f"[INGEST] Product facts: {refresh_facts(pages)}")
@@ -1,6 +1,111 @@
 import dotenv
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from langchain_core.messages import AIMessage
 from langchain_groq import ChatGroq
+from utils.disk_cache import DiskCache, CACHE_DIR
+from utils.rate_limiter import RateLimitedLLM, groq_scheduler
 
 dotenv.load_dotenv()
 
-llm = ChatGroq(model="llama-3.1-8b-instant")
+MODEL_NAME = "llama-3.1-8b-instant"
+
+# Retries are left to the shared scheduler, which also enforces the Groq RPM/TPM limits
+llm = RateLimitedLLM(ChatGroq(model=MODEL_NAME, max_retries=0), groq_scheduler)
+
+
+class MemoizedLLM:
+    """
+    Memoizing wrapper around a chat model for deterministic calls.
+    Responses are keyed on (model, prompt, params) and served from an in-memory LRU,
+    falling back to a persistent DiskCache before calling the model.
+    Only use it where the same prompt should always get the same answer.
+    """
+
+    def __init__(self, model, max_memory_entries: int = 512, store: DiskCache = None):
+        self.model = model
+        self.max_memory_entries = max_memory_entries
+        self.store = store
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, prompt, kwargs) -> str:
+        params = {
+            "model": getattr(self.model, "model_name", None) or getattr(self.model, "model", None),
+            "temperature": getattr(self.model, "temperature", None),
+            "max_tokens": getattr(self.model, "max_tokens", None),
+            **kwargs,
+        }
+        if not isinstance(prompt, str):
+            prompt = [(getattr(m, "type", ""), getattr(m, "content", m)) for m in prompt]
+        payload = json.dumps({"prompt": prompt, "params": params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _remember(self, key: str, content: str) -> None:
+        with self._lock:
+            self._memory[key] = content
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def invoke(self, prompt, **kwargs) -> AIMessage:
+        key = self._key(prompt, kwargs)
+
+        with self._lock:
+            content = self._memory.get(key)
+            if content is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return AIMessage(content=content, response_metadata={"cache": "memory"})
+
+        if self.store is not None:
+            content = self.store.get(key)
+            if content is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, content)
+                return AIMessage(content=content, response_metadata={"cache": "disk"})
+
+        response = self.model.invoke(prompt, **kwargs)
+        with self._lock:
+            self.misses += 1
+        content = str(response.content)
+        self._remember(key, content)
+        if self.store is not None:
+            self.store.set(key, content)
+        return response
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self) -> dict:
+        total = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / total, 3) if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+# Temperature 0 model for routing/extraction, memoized so repeated prompts are served locally
+cached_llm = MemoizedLLM(
+    RateLimitedLLM(ChatGroq(model=MODEL_NAME, temperature=0, max_retries=0), groq_scheduler),
+    max_memory_entries=int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", 512)),
+    store=DiskCache(
+        os.getenv("LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm_cache.sqlite")),
+        ttl=float(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600)),
+        max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 20000)),
+        table="llm_cache",
+    ),
+)
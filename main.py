@@ -1,3 +1,4 @@
+import argparse
 import dotenv
 from langgraph.graph import StateGraph, START, END
 from agents.user_agent import user_agent
@@ -6,81 +7,161 @@ from agents.agents import (
     sales_agent, 
     underwriting_agent,
     route_after_master,
-    route_after_sales
+    route_after_sales,
+    FINAL_RESPONSE_TAG,
+    MAX_COUNT
 )
 from agents.search_agent import search_agent
 from agents.feedback_agent import feedback_agent
 from state import State
+from utils.cassette import cassette_mode
+from utils.history import render_history
+from utils.tracing import traced_node, trace_clients, serve_metrics, tracer
 
 dotenv.load_dotenv()
 
-# Initialize graph
-graph_builder = StateGraph(State)
+def build_graph(checkpointer=None, interrupt_before=None):
+    """
+    Build and compile the conversation graph.
+    With a checkpointer, state is saved after every step under config["configurable"]["thread_id"],
+    so a run can stop (e.g. interrupt_before=["user_agent"]) and resume later, even in another process.
+    """
+    graph_builder = StateGraph(State)
 
-# Add all nodes
-graph_builder.add_node("master_agent", master_agent)
-graph_builder.add_node("sales_agent", sales_agent)
-graph_builder.add_node("user_agent", user_agent)
-graph_builder.add_node("search_agent", search_agent)
-graph_builder.add_node("underwriting_agent", underwriting_agent)
-graph_builder.add_node("feedback_agent", feedback_agent)
+    # Add all nodes (each wrapped so its latency and errors are recorded per session/turn)
+    graph_builder.add_node("master_agent", traced_node("master_agent", master_agent))
+    graph_builder.add_node("sales_agent", traced_node("sales_agent", sales_agent))
+    graph_builder.add_node("user_agent", traced_node("user_agent", user_agent))
+    graph_builder.add_node("search_agent", traced_node("search_agent", search_agent))
+    graph_builder.add_node("underwriting_agent", traced_node("underwriting_agent", underwriting_agent))
+    graph_builder.add_node("feedback_agent", traced_node("feedback_agent", feedback_agent))
 
-# Start always goes to master
-graph_builder.add_edge(START, "master_agent")
+    # Start always goes to master
+    graph_builder.add_edge(START, "master_agent")
 
-# User agent always goes back to master for routing
-graph_builder.add_edge("user_agent", "master_agent")
+    # User agent always goes back to master for routing
+    graph_builder.add_edge("user_agent", "master_agent")
 
-# Master agent uses conditional routing
-graph_builder.add_conditional_edges(
-    "master_agent",
-    route_after_master,
-    {
-        "user_agent": "user_agent",
-        "sales_agent": "sales_agent",
-        "search_agent": "search_agent",
-        "underwriting_agent": "underwriting_agent",
-        "__end__": END
-    }
-)
+    # Master agent uses conditional routing
+    graph_builder.add_conditional_edges(
+        "master_agent",
+        route_after_master,
+        {
+            "user_agent": "user_agent",
+            "sales_agent": "sales_agent",
+            "search_agent": "search_agent",
+            "underwriting_agent": "underwriting_agent",
+            "__end__": END
+        }
+    )
 
-# Sales agent conditional routing
-graph_builder.add_conditional_edges(
-    "sales_agent",
-    route_after_sales,
-    {
-        "feedback_agent": "feedback_agent",
-        "user_agent": "user_agent",
-        "__end__": END
-    }
-)
+    # Sales agent conditional routing
+    graph_builder.add_conditional_edges(
+        "sales_agent",
+        route_after_sales,
+        {
+            "feedback_agent": "feedback_agent",
+            "user_agent": "user_agent",
+            "__end__": END
+        }
+    )
 
-# Always goes to sales
-graph_builder.add_edge("feedback_agent", "sales_agent")
-graph_builder.add_edge("search_agent", "sales_agent")
+    # Always goes to sales
+    graph_builder.add_edge("feedback_agent", "sales_agent")
+    graph_builder.add_edge("search_agent", "sales_agent")
 
-# Underwriting agent always goes to master
-graph_builder.add_edge("underwriting_agent", "master_agent")
+    # Underwriting agent always goes to master
+    graph_builder.add_edge("underwriting_agent", "master_agent")
 
-# Compile graph
-graph = graph_builder.compile()
+    return graph_builder.compile(checkpointer=checkpointer, interrupt_before=interrupt_before)
 
-# Run conversation
-if __name__ == "__main__":
-    initial_state = {
+
+# In-process graph for simulated conversations (no checkpointing)
+graph = build_graph()
+
+
+def new_conversation_state(persona_id=None, session_id=None, max_count: int = MAX_COUNT) -> State:
+    """
+    Fresh state for one conversation; persona_id picks the USERS entry user_agent plays,
+    max_count the number of messages after which the conversation ends.
+    """
+    return {
         'count': 0,
-        'history': '',
+        'max_count': max_count,
+        'history': [],
+        'history_summary': '',
+        'summarized_upto': 0,
         'search_results': '',
         'emi_calculation': '',
         'action': '',
         'user_profile': {},
         'user_id': None,
-        'feedback': ''
+        'feedback': '',
+        'persona_id': persona_id,
+        'session_id': session_id,
+        'bypass_search_cache': False
     }
 
-    conversation = graph.invoke(initial_state)
+
+def stream_conversation(initial_state: State, config=None, compiled_graph=None, seen_turns=None):
+    """
+    Run the graph and yield events as they happen:
+      {"type": "token", "text": ...}             - pieces of the sales response as they are generated: a draft
+                                                   sentence by sentence while it passes the quality gate, a
+                                                   rewrite token by token
+      {"type": "retract"}                        - the tokens streamed so far were a draft the gate rejected;
+                                                   discard them, the rewrite follows
+      {"type": "message", "role": ..., "text": ...} - each completed assistant/user turn
+    The final state is returned as the generator's return value.
+    To resume a checkpointed graph pass initial_state=None, its compiled_graph, and the number of
+    history turns already delivered as seen_turns.
+    """
+    state = initial_state
+    if seen_turns is None:
+        seen_turns = len(initial_state.get("history", []))
+    stream_modes = ["messages", "custom", "values"]
+    for mode, payload in (compiled_graph or graph).stream(initial_state, config, stream_mode=stream_modes):
+        if mode == "custom":
+            yield payload
+        elif mode == "messages":
+            chunk, metadata = payload
+            if FINAL_RESPONSE_TAG in (metadata.get("tags") or []) and chunk.content:
+                yield {"type": "token", "text": chunk.content}
+        else:
+            state = payload
+            for turn in state["history"][seen_turns:]:
+                if turn["role"] != "system":
+                    yield {"type": "message", "role": turn["role"], "text": turn["text"]}
+            seen_turns = len(state["history"])
+    return state
+
+
+# Run conversation
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run one simulated loan conversation.")
+    parser.add_argument("--persona", type=int, default=None, help="USERS persona id for user_agent")
+    parser.add_argument("--record", metavar="CASSETTE", help="Record all LLM and search calls to this file")
+    parser.add_argument("--replay", metavar="CASSETTE", help="Replay LLM and search calls from this file")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus metrics on this port")
+    args = parser.parse_args()
+
+    initial_state = new_conversation_state(persona_id=args.persona)
+    # Local caches would hide calls from the cassette, so go to the (recorded/replayed) clients every time
+    initial_state['bypass_search_cache'] = bool(args.record or args.replay)
+
+    if args.metrics_port is not None:
+        serve_metrics(args.metrics_port)
+
+    with cassette_mode(record_path=args.record, replay_path=args.replay), trace_clients():
+        conversation = graph.invoke(initial_state)
 
     print("\n" + "="*50)
     print("FINAL CONVERSATION HISTORY:")
     print("="*50)
-    print(conversation['history'])
\ No newline at end of file
+    print(render_history(conversation['history']))
+
+    print("\n" + "="*50)
+    print("TRACE SUMMARY:")
+    print("="*50)
+    for name, metrics in tracer.summary().items():
+        print(f"{name}: {metrics}")
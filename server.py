@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse, parse_qs
+from sessions import SessionManager
+from utils.clients import swap_clients
+from utils.tracing import tracer, trace_clients
+
+MAX_INFLIGHT_LLM = int(os.getenv("MAX_INFLIGHT_LLM", 32))      # LLM calls running at once, process-wide
+MAX_CONCURRENT_RUNS = int(os.getenv("MAX_CONCURRENT_RUNS", 64))  # graph runs executing at once
+MAX_QUEUED_RUNS = int(os.getenv("MAX_QUEUED_RUNS", 256))         # runs admitted beyond that before shedding
+EVICT_INTERVAL = float(os.getenv("SESSION_EVICT_INTERVAL", 60))
+MAX_BODY_BYTES = 64 * 1024
+
+SESSION_PATH = re.compile(r"^/sessions/([\w-]{1,64})(/messages)?$")
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           409: "Conflict", 413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class LLMLimiter:
+    """Process-wide cap on in-flight LLM calls; callers beyond the cap wait for a slot."""
+
+    def __init__(self, max_inflight: int = MAX_INFLIGHT_LLM):
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.waiting = 0
+        self._slots = threading.BoundedSemaphore(max_inflight)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        with self._lock:
+            self.waiting += 1
+        self._slots.acquire()
+        with self._lock:
+            self.waiting -= 1
+            self.inflight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.inflight -= 1
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {"llm_inflight": self.inflight, "llm_waiting": self.waiting, "llm_max_inflight": self.max_inflight}
+
+
+class LimitedLLM:
+    """Chat model wrapper that takes an LLMLimiter slot for every call."""
+
+    def __init__(self, model, limiter: LLMLimiter):
+        self.model = model
+        self.limiter = limiter
+
+    def invoke(self, *args, **kwargs):
+        with self.limiter.slot():
+            return self.model.invoke(*args, **kwargs)
+
+    def batch(self, prompts, config=None, return_exceptions: bool = False, **kwargs):
+        """Invoke each prompt on its own slot, in parallel as far as free slots allow."""
+        max_workers = (config or {}).get("max_concurrency") or len(prompts) or 1
+        config = {k: v for k, v in (config or {}).items() if k != "max_concurrency"} or None
+
+        def run(prompt):
+            try:
+                return self.invoke(prompt, config=config, **kwargs)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, run, p) for p in prompts]
+            return [f.result() for f in futures]
+
+    def stream(self, *args, **kwargs):
+        with self.limiter.slot():
+            yield from self.model.stream(*args, **kwargs)
+
+    def with_config(self, *args, **kwargs):
+        return LimitedLLM(self.model.with_config(*args, **kwargs), self.limiter)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class ConversationServer:
+    """
+    Asyncio HTTP front end for SessionManager.
+
+      POST /sessions                     {"persona_id"?} -> {"session_id", "messages"}
+      POST /sessions/<id>/messages       {"text"}        -> {"session_id", "messages", "finished"}
+           ?stream=1                     newline-delimited JSON stream_conversation events instead
+      GET  /sessions/<id>                                -> {"session_id", "history", "finished"}
+      GET  /health                                       -> load and session counters
+      GET  /metrics                                      -> Prometheus text from utils.tracing
+
+    Graph runs are blocking, so they execute on a thread pool of MAX_CONCURRENT_RUNS workers.
+    At most MAX_QUEUED_RUNS more are queued behind them; beyond that requests are shed with 503.
+    """
+
+    def __init__(self, sessions: SessionManager, max_concurrent_runs: int = MAX_CONCURRENT_RUNS,
+                 max_queued_runs: int = MAX_QUEUED_RUNS):
+        self.sessions = sessions
+        self.max_admitted = max_concurrent_runs + max_queued_runs
+        self.admitted = 0
+        self.shed = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_runs, thread_name_prefix="graph-run")
+
+    # --- request handling -------------------------------------------------
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    # The body was not read, so the connection can't be reused
+                    await self._send_json(writer, e.status, {"error": str(e)}, {"Connection": "close"})
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    await self._dispatch(method, target, body, writer)
+                except HTTPError as e:
+                    extra = {"Retry-After": "1"} if e.status == 503 else {}
+                    await self._send_json(writer, e.status, {"error": str(e)}, extra)
+                except Exception as e:
+                    await self._send_json(writer, 500, {"error": f"{type(e).__name__}: {e}"})
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise ConnectionError("malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0) or 0)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"request body over {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    async def _dispatch(self, method: str, target: str, body: bytes, writer: asyncio.StreamWriter) -> None:
+        url = urlparse(target)
+        query = parse_qs(url.query)
+
+        if url.path == "/health" and method == "GET":
+            await self._send_json(writer, 200, self.stats())
+            return
+        if url.path == "/metrics" and method == "GET":
+            await self._send(writer, 200, tracer.prometheus_text().encode(), "text/plain; version=0.0.4")
+            return
+        if url.path == "/sessions" and method == "POST":
+            payload = self._json(body)
+            events = await self._run(None, None, payload.get("persona_id"))
+            session_id = events.pop()
+            await self._send_json(writer, 201, {"session_id": session_id, "messages": _assistant_messages(events)})
+            return
+
+        match = SESSION_PATH.match(url.path)
+        if not match:
+            raise HTTPError(404, "not found")
+        session_id, messages = match.groups()
+
+        if not messages:
+            if method != "GET":
+                raise HTTPError(405, "method not allowed")
+            state = self.sessions.state(session_id)
+            if not state:
+                raise HTTPError(404, "unknown session")
+            history = [{"role": t["role"], "text": t["text"]} for t in state["history"] if t["role"] != "system"]
+            await self._send_json(writer, 200, {
+                "session_id": session_id, "history": history, "finished": self.sessions.is_finished(session_id)
+            })
+            return
+
+        if method != "POST":
+            raise HTTPError(405, "method not allowed")
+        text = str(self._json(body).get("text", "")).strip()
+        if not text:
+            raise HTTPError(400, "missing 'text'")
+        if not self.sessions.state(session_id):
+            raise HTTPError(404, "unknown session; create one with POST /sessions")
+        if self.sessions.is_finished(session_id):
+            raise HTTPError(409, "conversation has ended")
+
+        if query.get("stream", ["0"])[0] not in ("0", "false", ""):
+            await self._stream(writer, session_id, text)
+            return
+        events = await self._run(session_id, text)
+        events.pop()
+        await self._send_json(writer, 200, {
+            "session_id": session_id,
+            "messages": _assistant_messages(events),
+            "finished": self.sessions.is_finished(session_id),
+        })
+
+    # --- graph runs -------------------------------------------------------
+
+    @contextmanager
+    def _admit(self):
+        if self.admitted >= self.max_admitted:
+            self.shed += 1
+            raise HTTPError(503, "server busy, retry shortly")
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.admitted -= 1
+
+    def _collect(self, session_id, text, persona_id=None) -> list:
+        """Run one session turn on a worker thread; the session id is appended as the last item."""
+        session_id = session_id or uuid.uuid4().hex
+        return list(self.sessions.stream(session_id, text, persona_id)) + [session_id]
+
+    async def _run(self, session_id, text, persona_id=None) -> list:
+        with self._admit():
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, context.run, self._collect, session_id, text, persona_id)
+
+    async def _stream(self, writer: asyncio.StreamWriter, session_id: str, text: str) -> None:
+        with self._admit():
+            loop = asyncio.get_running_loop()
+            events = asyncio.Queue()
+            done = object()
+
+            def produce():
+                try:
+                    for event in self.sessions.stream(session_id, text):
+                        loop.call_soon_threadsafe(events.put_nowait, event)
+                except Exception as e:
+                    loop.call_soon_threadsafe(events.put_nowait, {"type": "error", "text": f"{type(e).__name__}: {e}"})
+                finally:
+                    loop.call_soon_threadsafe(events.put_nowait, done)
+
+            run = loop.run_in_executor(self._executor, contextvars.copy_context().run, produce)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n"
+            )
+            while (event := await events.get()) is not done:
+                if event["type"] == "message" and event["role"] != "assistant":
+                    continue
+                line = json.dumps(event).encode() + b"\n"
+                writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+                await writer.drain()
+            await run
+            finished = json.dumps({"type": "done", "finished": self.sessions.is_finished(session_id)}).encode() + b"\n"
+            writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(finished), finished))
+            await writer.drain()
+
+    # --- helpers ----------------------------------------------------------
+
+    @staticmethod
+    def _json(body: bytes) -> dict:
+        if not body:
+            return {}
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            raise HTTPError(400, "body must be JSON")
+        if not isinstance(payload, dict):
+            raise HTTPError(400, "body must be a JSON object")
+        return payload
+
+    async def _send(self, writer, status: int, body: bytes, content_type: str, extra_headers: dict = None) -> None:
+        headers = {"Content-Type": content_type, "Content-Length": str(len(body)), **(extra_headers or {})}
+        head = f"HTTP/1.1 {status} {REASONS.get(status, 'Error')}\r\n"
+        head += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _send_json(self, writer, status: int, payload: dict, extra_headers: dict = None) -> None:
+        await self._send(writer, status, json.dumps(payload).encode(), "application/json", extra_headers)
+
+    def stats(self) -> dict:
+        return {"admitted_runs": self.admitted, "shed": self.shed, **self.sessions.stats(), **limiter.stats()}
+
+
+def _assistant_messages(events: list) -> list:
+    return [e["text"] for e in events if e.get("type") == "message" and e.get("role") == "assistant"]
+
+
+limiter = LLMLimiter()
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8080, sessions: SessionManager = None):
+    """
+    Serve until cancelled, tracing and capping in-flight LLM calls; idle session handles are evicted
+    and conversations past their retention pruned periodically.
+    """
+    import agents.agents as agents_module
+
+    app = ConversationServer(sessions or SessionManager())
+    with trace_clients(), swap_clients(
+        llm=LimitedLLM(agents_module.llm, limiter),
+        cached_llm=LimitedLLM(agents_module.cached_llm, limiter),
+    ):
+        server = await asyncio.start_server(app.handle, host, port, limit=MAX_BODY_BYTES, backlog=1024)
+        print(f"Loan assistant listening on http://{host}:{server.sockets[0].getsockname()[1]}")
+
+        async def evict_loop():
+            while True:
+                await asyncio.sleep(EVICT_INTERVAL)
+                app.sessions.evict_idle()
+                app.sessions.prune_expired()
+
+        evictor = asyncio.create_task(evict_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the loan assistant over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
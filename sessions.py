@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from agents.quality_gate import discard_background_feedback
+from main import build_graph, new_conversation_state, stream_conversation
+from utils.disk_cache import CACHE_DIR
+from utils.history import add_turn
+from utils.sqlite_checkpointer import SqliteCheckpointer
+
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(CACHE_DIR, "sessions.sqlite"))
+SESSION_IDLE_TIMEOUT = float(os.getenv("SESSION_IDLE_TIMEOUT", 15 * 60))
+# How long an untouched conversation stays resumable before prune_expired() deletes it
+SESSION_RETENTION = float(os.getenv("SESSION_RETENTION", 30 * 24 * 3600))
+# Messages a real customer conversation may run to; the simulation's MAX_COUNT is far too low for one
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", 200))
+
+
+def make_checkpointer(path: str = SESSION_DB_PATH) -> SqliteCheckpointer:
+    """Durable SQLite checkpointer, so sessions survive a restart."""
+    return SqliteCheckpointer(path)
+
+
+class _Session:
+    __slots__ = ("lock", "last_active")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_active = time.monotonic()
+
+
+class SessionManager:
+    """
+    Runs conversations one customer message at a time on a checkpointed graph.
+
+    The graph is interrupted before `user_agent`, so each run ends where the customer is
+    expected to reply. Conversation state lives only in the checkpointer, keyed by
+    session id (the LangGraph thread_id), and is loaded when a message arrives. In memory
+    the manager keeps just a lock and a last-active time per session; evict_idle() drops those
+    for sessions idle longer than `idle_timeout` (they resume from the checkpointer on their next
+    message), and prune_expired() deletes conversations untouched for `retention` seconds.
+    """
+
+    def __init__(self, checkpointer=None, idle_timeout: float = SESSION_IDLE_TIMEOUT,
+                 max_messages: int = SESSION_MAX_MESSAGES, retention: float = SESSION_RETENTION):
+        self.checkpointer = checkpointer if checkpointer is not None else make_checkpointer()
+        self.graph = build_graph(self.checkpointer, interrupt_before=["user_agent"])
+        self.idle_timeout = idle_timeout
+        self.max_messages = max_messages
+        self.retention = retention
+        self.pruned = 0
+        self.resumed = 0
+        self.evicted = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def config(session_id: str) -> dict:
+        return {"configurable": {"thread_id": session_id}}
+
+    def _session(self, session_id: str) -> _Session:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session()
+            session.last_active = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def state(self, session_id: str) -> dict:
+        """Latest saved state of a session ({} if it has never run)."""
+        return self.graph.get_state(self.config(session_id)).values or {}
+
+    def is_finished(self, session_id: str) -> bool:
+        snapshot = self.graph.get_state(self.config(session_id))
+        return bool(snapshot.values) and not snapshot.next
+
+    def prepare(self, session_id: str, message: str = None, persona_id=None):
+        """
+        Input and config for the next run of a session: a fresh state for a new session,
+        otherwise None (resume from the checkpoint) after recording the customer's message
+        as if user_agent had produced it. Returns (input, config, turns already seen).
+        Must not be called for an existing session without a message: resuming would run user_agent.
+        """
+        config = self.config(session_id)
+        values = self.state(session_id)
+        if not values:
+            state = new_conversation_state(persona_id=persona_id, session_id=session_id, max_count=self.max_messages)
+            return state, config, 0
+        self.resumed += 1
+        history = list(values["history"])
+        seen = len(history)
+        add_turn(history, "user", message)
+        self.graph.update_state(
+            config, {"history": history, "count": values.get("count", 0) + 1}, as_node="user_agent"
+        )
+        return None, config, seen + 1
+
+    def start(self, session_id: str = None, persona_id=None):
+        """Open a session and return (session_id, assistant greeting messages)."""
+        session_id = session_id or uuid.uuid4().hex
+        return session_id, self.send(session_id, None, persona_id=persona_id)
+
+    def stream(self, session_id: str, message: str = None, persona_id=None):
+        """
+        Deliver one customer message (None to just open the session) and run the graph until it
+        waits for the next one, yielding stream_conversation events for the new turns.
+        Opening an existing session runs nothing: its saved turns are yielded and its state returned.
+        """
+        with self._session(session_id).lock:
+            values = self.state(session_id)
+            if values and message is None:
+                for turn in values["history"]:
+                    if turn["role"] != "system":
+                        yield {"type": "message", "role": turn["role"], "text": turn["text"]}
+                return values
+            graph_input, config, seen = self.prepare(session_id, message, persona_id)
+            if graph_input is not None and message is not None:
+                # First contact carries a message: run the greeting, then deliver it
+                yield from stream_conversation(graph_input, config, self.graph)
+                graph_input, config, seen = self.prepare(session_id, message)
+            return (yield from stream_conversation(graph_input, config, self.graph, seen_turns=seen))
+
+    def send(self, session_id: str, message: str, persona_id=None) -> list:
+        """Like stream(), but returns just the assistant messages produced in this run."""
+        return [
+            event["text"] for event in self.stream(session_id, message, persona_id)
+            if event["type"] == "message" and event["role"] == "assistant"
+        ]
+
+    def evict_idle(self) -> int:
+        """Forget in-memory handles of sessions idle longer than idle_timeout (their state stays saved)."""
+        cutoff = time.monotonic() - self.idle_timeout
+        evicted = 0
+        with self._lock:
+            while self._sessions:
+                session_id, session = next(iter(self._sessions.items()))
+                if session.last_active > cutoff or session.lock.locked():
+                    break
+                del self._sessions[session_id]
+                discard_background_feedback(session_id)
+                evicted += 1
+        self.evicted += evicted
+        return evicted
+
+    def prune_expired(self) -> int:
+        """Delete saved conversations not written to for `retention` seconds."""
+        with self._lock:  # held while deleting, so a message for a pruned session can't start meanwhile
+            expired = self.checkpointer.delete_threads_before(time.time() - self.retention)
+            for session_id in expired:
+                self._sessions.pop(session_id, None)
+        self.pruned += len(expired)
+        return len(expired)
+
+    def stats(self) -> dict:
+        return {"active": len(self._sessions), "resumed": self.resumed, "evicted": self.evicted, "pruned": self.pruned}
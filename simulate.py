@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+from main import graph, new_conversation_state
+from agents.prompts import USERS
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; returns 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+async def run_conversation(session_id: str, persona_id: int, semaphore: asyncio.Semaphore) -> dict:
+    """
+    Drive one simulated conversation through the graph and time each assistant turn.
+    A turn runs from the moment user_agent speaks until the next final sales response.
+    """
+    async with semaphore:
+        state = new_conversation_state(persona_id=persona_id, session_id=session_id)
+        turn_latencies = []
+        start = time.perf_counter()
+        turn_start = start
+        error = None
+
+        try:
+            async for update in graph.astream(state, stream_mode="updates"):
+                for node, node_state in update.items():
+                    now = time.perf_counter()
+                    if node == "user_agent":
+                        turn_start = now
+                    elif node == "sales_agent" and node_state and node_state.get("action") in ("user_agent", "end"):
+                        turn_latencies.append(now - turn_start)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+
+        return {
+            "session_id": session_id,
+            "persona_id": persona_id,
+            "duration": time.perf_counter() - start,
+            "turn_latencies": turn_latencies,
+            "error": error,
+        }
+
+
+async def run_batch(personas, concurrency: int) -> dict:
+    """Run one conversation per persona entry with at most `concurrency` in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        run_conversation(f"sim-{i}", persona_id, semaphore)
+        for i, persona_id in enumerate(personas)
+    ])
+    elapsed = time.perf_counter() - start
+
+    latencies = [lat for r in results for lat in r["turn_latencies"]]
+    completed = [r for r in results if r["error"] is None]
+
+    return {
+        "conversations": len(results),
+        "completed": len(completed),
+        "failed": len(results) - len(completed),
+        "concurrency": concurrency,
+        "wall_time_s": round(elapsed, 3),
+        "conversations_per_min": round(len(completed) / elapsed * 60, 2) if elapsed else 0.0,
+        "turns": len(latencies),
+        "turn_latency_p50_s": round(percentile(latencies, 50), 3),
+        "turn_latency_p95_s": round(percentile(latencies, 95), 3),
+        "turn_latency_mean_s": round(statistics.mean(latencies), 3) if latencies else 0.0,
+        "sessions": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many simulated loan conversations concurrently.")
+    parser.add_argument("--personas", type=int, nargs="*", default=sorted(USERS),
+                        help="USERS persona ids to cycle through (default: all)")
+    parser.add_argument("--conversations", "-n", type=int, default=None,
+                        help="Total conversations to run (default: one per persona)")
+    parser.add_argument("--concurrency", "-c", type=int, default=5,
+                        help="Maximum conversations in flight at once")
+    parser.add_argument("--output", "-o", default=None, help="Write the full JSON report to this path")
+    parser.add_argument("--quiet", "-q", action="store_true", help="Suppress per-agent console output")
+    args = parser.parse_args()
+
+    total = args.conversations or len(args.personas)
+    personas = [args.personas[i % len(args.personas)] for i in range(total)]
+
+    sink = open(os.devnull, "w") if args.quiet else sys.stdout
+    with contextlib.redirect_stdout(sink):
+        report = asyncio.run(run_batch(personas, args.concurrency))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    summary = {k: v for k, v in report.items() if k != "sessions"}
+    print("\n" + "="*50)
+    print("SIMULATION REPORT:")
+    print("="*50)
+    print(json.dumps(summary, indent=2))
+    for r in report["sessions"]:
+        if r["error"]:
+            print(f"  {r['session_id']} (persona {r['persona_id']}) failed: {r['error']}")
+
+
+if __name__ == "__main__":
+    main()
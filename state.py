@@ -1,8 +1,12 @@
-from typing import TypedDict, Any, Optional, Dict
+from typing import TypedDict, Any, Optional, Dict, List
+from utils.history import Turn
 
 class State(TypedDict):
-    history: str                    # Conversation history
+    history: List[Turn]             # Append-only conversation log (render with utils.history.render_history)
+    history_summary: str            # Running summary of turns already folded out of prompts
+    summarized_upto: int            # Index of the first history turn not yet in history_summary
     count: int                      # Message counter for max limit
+    max_count: int                  # Messages allowed in this conversation (absent = agents.agents.MAX_COUNT)
     search_results: str             # Search results (populated by search, consumed by sales)
     emi_calculation: str            # EMI calculation results (populated by emi_calculator, consumed by sales)
     action: str                     # Next action/agent to route to (populated by all agents)
@@ -10,5 +14,8 @@ class State(TypedDict):
     user_profile: Dict[str, Any]    # User profile data extracted from conversation
     feedback: Optional[str]
     last_response: str
+    persona_id: Optional[int]       # USERS persona played by user_agent (defaults to 2)
+    session_id: Optional[str]       # Identifies one conversation when many run concurrently
+    bypass_search_cache: bool       # Force live searches for this conversation (skip cached results)
     # Example profile fields: name, phone, email, income, employment_type, 
     # loan_amount, loan_type, tenure, interest_rate, credit_score, pre_approved_amount, etc.
\ No newline at end of file
@@ -0,0 +1,146 @@
+import http.client
+import json
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlparse
+from tools.credit_bureau import bulk_bureau_lookup
+from utils.disk_cache import DiskCache, CACHE_DIR
+
+BUREAU_URL = os.getenv("BUREAU_URL")          # e.g. http://127.0.0.1:8765; unset = in-process USERS lookup
+BUREAU_CACHE_TTL = float(os.getenv("BUREAU_CACHE_TTL", 24 * 3600))
+BUREAU_POOL_SIZE = int(os.getenv("BUREAU_POOL_SIZE", 8))
+BUREAU_TIMEOUT = float(os.getenv("BUREAU_TIMEOUT", 10))
+
+
+class BureauError(Exception):
+    """Bureau lookup failed (unknown user or service error)."""
+
+
+class ConnectionPool:
+    """Fixed-size pool of keep-alive HTTP connections to one host."""
+
+    def __init__(self, base_url: str, size: int = BUREAU_POOL_SIZE, timeout: float = BUREAU_TIMEOUT):
+        parsed = urlparse(base_url)
+        self.prefix = parsed.path.rstrip("/")
+        conn_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        self._new = lambda: conn_class(parsed.hostname, parsed.port, timeout=timeout)
+        self._pool = queue.LifoQueue()
+        for _ in range(size):
+            self._pool.put(None)  # connections are opened lazily
+
+    def get_json(self, path: str):
+        """GET prefix+path and return (status, decoded JSON body)."""
+        conn = self._pool.get() or self._new()
+        try:
+            try:
+                conn.request("GET", self.prefix + path)
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # Server closed an idle keep-alive connection; retry once on a fresh one
+                conn.close()
+                conn = self._new()
+                conn.request("GET", self.prefix + path)
+                response = conn.getresponse()
+            body = response.read()
+            return response.status, json.loads(body) if body else {}
+        except Exception:
+            conn.close()
+            conn = None
+            raise
+        finally:
+            self._pool.put(conn)
+
+
+class BureauClient:
+    """
+    Credit bureau client returning credit score and pre-approved amount in one fetch.
+    Results are cached for `ttl` seconds on disk, and concurrent fetches for the same user
+    (e.g. from parallel sessions) share a single in-flight request.
+    """
+
+    def __init__(self, base_url: str = None, cache: DiskCache = None):
+        self.base_url = base_url
+        self.cache = cache
+        self.requests = 0
+        self.coalesced = 0
+        self._pool = ConnectionPool(base_url) if base_url else None
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _request(self, user_id: int) -> dict:
+        with self._lock:
+            self.requests += 1
+        if self._pool is None:
+            record = bulk_bureau_lookup([user_id]).get(user_id)
+            if record is None:
+                raise BureauError(f"No bureau record for user {user_id}")
+            return record
+
+        status, data = self._pool.get_json(f"/bureau/{user_id}")
+        if status != 200:
+            raise BureauError(f"Bureau returned {status} for user {user_id}: {data.get('error', '')}")
+        return {"credit_score": int(data["credit_score"]), "pre_approved_amount": int(data["pre_approved_amount"])}
+
+    def fetch(self, user_id: int) -> dict:
+        """
+        Fetch bureau data for a user.
+
+        Returns:
+            dict: {"credit_score": int, "pre_approved_amount": int}
+        Raises:
+            BureauError: If the user is unknown or the service fails.
+        """
+        user_id = int(user_id)
+        key = f"bureau:{user_id}"
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        with self._lock:
+            future = self._inflight.get(user_id)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[user_id] = future
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            # The previous owner caches its record before giving up ownership, so a caller that missed
+            # the cache while that fetch was finishing finds it here instead of fetching again
+            record = self.cache.get(key) if self.cache is not None else None
+            if record is None:
+                record = self._request(user_id)
+                if self.cache is not None:
+                    self.cache.set(key, record)
+            future.set_result(record)
+            return record
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(user_id, None)
+
+    def stats(self) -> dict:
+        stats = {"requests": self.requests, "coalesced": self.coalesced}
+        if self.cache is not None:
+            stats.update({f"cache_{k}": v for k, v in self.cache.stats().items()})
+        return stats
+
+
+bureau_client = BureauClient(
+    BUREAU_URL,
+    cache=DiskCache(
+        os.getenv("BUREAU_CACHE_PATH", os.path.join(CACHE_DIR, "bureau_cache.sqlite")),
+        ttl=BUREAU_CACHE_TTL,
+        max_entries=int(os.getenv("BUREAU_CACHE_MAX_ENTRIES", 100000)),
+        table="bureau",
+    ),
+)
@@ -0,0 +1,72 @@
+import argparse
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from agents.prompts import USERS
+
+BUREAU_PATH = re.compile(r"^/bureau/(\d+)$")
+
+
+class BureauHandler(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the credit bureau service.
+    GET /bureau/<user_id> -> {"user_id", "credit_score", "pre_approved_amount"} from USERS.
+    """
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled client connections are reused
+    latency = 0.0
+
+    def do_GET(self):
+        match = BUREAU_PATH.match(self.path)
+        user_id = int(match.group(1)) if match else None
+        if self.latency:
+            time.sleep(self.latency)
+
+        if user_id not in USERS:
+            self._send(404, {"error": "user not found"})
+            return
+        self._send(200, {
+            "user_id": user_id,
+            "credit_score": USERS[user_id]['credit_score'],
+            "pre_approved_amount": USERS[user_id]['pre-approved_amount'],
+        })
+
+    def _send(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_bureau_server(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Start the stand-in bureau on a background thread (port 0 picks a free port).
+    The base URL is f"http://{host}:{server.server_port}"; call server.shutdown() to stop it.
+    """
+    handler = type("ConfiguredBureauHandler", (BureauHandler,), {"latency": latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local credit bureau stand-in.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per request")
+    args = parser.parse_args()
+
+    server = start_bureau_server(args.host, args.port, args.latency)
+    print(f"Bureau stand-in listening on http://{args.host}:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
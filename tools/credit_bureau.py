@@ -21,4 +21,20 @@ def pre_approved_amount_api(user_id: int) -> int:
         int: The pre-approved loan amount (in INR).
     """
     
-    return USERS[user_id]['pre-approved_amount']
\ No newline at end of file
+    return USERS[user_id]['pre-approved_amount']
+
+def bulk_bureau_lookup(user_ids) -> dict:
+    """
+    Fetches credit score and pre-approved amount for many users in one call.
+
+    Args:
+        user_ids (Iterable[int]): The user IDs to look up.
+    Returns:
+        dict: {user_id: {"credit_score": int, "pre_approved_amount": int}} for the users found;
+        unknown user IDs are left out.
+    """
+    return {
+        user_id: {"credit_score": USERS[user_id]['credit_score'], "pre_approved_amount": USERS[user_id]['pre-approved_amount']}
+        for user_id in user_ids
+        if user_id in USERS
+    }
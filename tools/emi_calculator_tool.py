@@ -1,13 +1,15 @@
+import numpy as np
+
 
 def calculate_emi(principal: float, interest_rate: float, tenure_months: int) -> float:
-    """ 
+    """
     Calculate the Equated Monthly Installment (EMI) for a loan for given principal, annual interest rate, and tenure in months.
 
     Args:
         principal (float): The loan amount in INR.
         interest_rate (float): The annual interest rate (in percentage).
         tenure_months (int): The loan tenure in months.
-    
+
     Returns:
         float: The EMI amount rounded to the nearest integer.
     """
@@ -20,3 +22,151 @@ def calculate_emi(principal: float, interest_rate: float, tenure_months: int) ->
         emi = (principal * monthly_rate * (1 + monthly_rate) ** tenure_months) / \
               ((1 + monthly_rate) ** tenure_months - 1)
     return round(emi, 0)
+
+
+def emi_batch(principal, interest_rate, tenure_months) -> dict:
+    """
+    Vectorized EMI for arrays of loans. Inputs broadcast against each other with NumPy rules,
+    so scalars, 1-D arrays or grids (e.g. rates[:, None] and tenures[None, :]) all work.
+
+    Args:
+        principal (array_like): Loan amounts in INR.
+        interest_rate (array_like): Annual interest rates (in percentage).
+        tenure_months (array_like): Loan tenures in months.
+    Returns:
+        dict: 'emi', 'total_payment' and 'total_interest' arrays (unrounded), in the broadcast shape.
+    """
+    principal = np.asarray(principal, dtype=float)
+    tenure = np.asarray(tenure_months, dtype=float)
+    monthly_rate = np.asarray(interest_rate, dtype=float) / (12 * 100)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.power(1 + monthly_rate, tenure)
+        emi = np.where(
+            monthly_rate == 0,
+            principal / tenure,
+            principal * monthly_rate * growth / (growth - 1),
+        )
+    emi = np.where(tenure > 0, emi, 0.0)
+    total_payment = emi * tenure
+    return {
+        "emi": emi,
+        "total_payment": total_payment,
+        "total_interest": total_payment - principal,
+    }
+
+
+def calculate_emi_details(principal: float, interest_rate: float, tenure_months: int) -> dict:
+    """
+    EMI, total payment and total interest for a single loan.
+
+    Returns:
+        dict: 'emi', 'total_payment' and 'total_interest' as floats rounded to 2 decimals.
+    """
+    result = emi_batch(principal, interest_rate, tenure_months)
+    return {key: round(float(value), 2) for key, value in result.items()}
+
+
+def offer_grid(principal: float, interest_rates, tenures_months) -> dict:
+    """
+    EMI and total interest for every (rate, tenure) combination of one principal.
+
+    Returns:
+        dict: 'rates', 'tenures', and 'emi' / 'total_interest' arrays of shape (len(rates), len(tenures)).
+    """
+    rates = np.asarray(interest_rates, dtype=float)
+    tenures = np.asarray(tenures_months, dtype=float)
+    result = emi_batch(principal, rates[:, None], tenures[None, :])
+    return {"rates": rates, "tenures": tenures, "emi": result["emi"], "total_interest": result["total_interest"]}
+
+
+def amortization_schedules(principal, interest_rate, tenure_months, prepayments=None, topups=None) -> dict:
+    """
+    Month-by-month amortization for many loans at once (vectorized across loans).
+
+    Prepayments reduce the outstanding balance and keep the EMI, so the loan closes early.
+    Top-ups add to the balance and the EMI is recomputed over the remaining tenure.
+
+    Args:
+        principal (array_like): Loan amounts in INR, shape (n,) or scalar.
+        interest_rate (array_like): Annual interest rates (in percentage), broadcast to (n,).
+        tenure_months (array_like): Tenures in months, broadcast to (n,).
+        prepayments (array_like | dict, optional): Extra principal paid at the end of each month,
+            shape (n, max_tenure), or {month_index: amount} applied to every loan (months are 1-based).
+        topups (array_like | dict, optional): Additional amount disbursed at the end of each month,
+            same forms as prepayments.
+    Returns:
+        dict: 'payment', 'interest', 'principal', 'prepayment', 'balance' arrays of shape (n, max_tenure),
+        plus per-loan 'emi' (initial), 'total_interest', 'total_paid' and 'months' (actual months to close).
+    """
+    principal, rate, tenure = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(principal, dtype=float)),
+        np.atleast_1d(np.asarray(interest_rate, dtype=float)),
+        np.atleast_1d(np.asarray(tenure_months, dtype=int)),
+    )
+    n = principal.shape[0]
+    months = int(tenure.max()) if n else 0
+    monthly_rate = rate / (12 * 100)
+
+    def as_matrix(extra):
+        matrix = np.zeros((n, months))
+        if extra is None:
+            return matrix
+        if isinstance(extra, dict):
+            for month, amount in extra.items():
+                if 1 <= month <= months:
+                    matrix[:, month - 1] = amount
+            return matrix
+        extra = np.asarray(extra, dtype=float)
+        matrix[:, :min(months, extra.shape[-1])] = np.broadcast_to(extra, (n, extra.shape[-1]))[:, :months]
+        return matrix
+
+    prepay = as_matrix(prepayments)
+    topup = as_matrix(topups)
+
+    payment = np.zeros((n, months))
+    interest = np.zeros((n, months))
+    principal_paid = np.zeros((n, months))
+    prepaid = np.zeros((n, months))
+    balance = np.zeros((n, months))
+
+    emi = emi_batch(principal, rate, tenure)["emi"]
+    initial_emi = emi.copy()
+    outstanding = principal.copy()
+
+    for m in range(months):
+        active = (outstanding > 0.005) & (m < tenure)
+        month_interest = np.where(active, outstanding * monthly_rate, 0.0)
+        # Last scheduled month (or an early close) pays off whatever is left
+        due = np.where(m == tenure - 1, outstanding + month_interest, np.minimum(emi, outstanding + month_interest))
+        due = np.where(active, due, 0.0)
+        month_principal = due - month_interest
+        outstanding = outstanding - month_principal
+
+        extra = np.where(active, np.minimum(prepay[:, m], outstanding), 0.0)
+        outstanding = outstanding - extra
+
+        added = np.where(active & (m < tenure - 1), topup[:, m], 0.0)
+        if added.any():
+            outstanding = outstanding + added
+            remaining = tenure - (m + 1)
+            emi = np.where(added > 0, emi_batch(outstanding, rate, remaining)["emi"], emi)
+
+        payment[:, m] = due
+        interest[:, m] = month_interest
+        principal_paid[:, m] = month_principal
+        prepaid[:, m] = extra
+        balance[:, m] = np.maximum(outstanding, 0.0)
+
+    paid_months = (payment > 0).sum(axis=1)
+    return {
+        "payment": payment,
+        "interest": interest,
+        "principal": principal_paid,
+        "prepayment": prepaid,
+        "balance": balance,
+        "emi": initial_emi,
+        "total_interest": interest.sum(axis=1),
+        "total_paid": payment.sum(axis=1) + prepaid.sum(axis=1),
+        "months": paid_months,
+    }
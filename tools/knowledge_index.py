@@ -0,0 +1,276 @@
+import json
+import math
+import os
+import re
+import struct
+import threading
+from collections import Counter
+from typing import List, Optional
+import numpy as np
+from tools.query_index import STOPWORDS
+from utils.disk_cache import CACHE_DIR
+from utils.history import estimate_tokens
+
+KNOWLEDGE_INDEX_PATH = os.getenv("KNOWLEDGE_INDEX_PATH", os.path.join(CACHE_DIR, "knowledge_index.bin"))
+# Share of the query's IDF weight the top passage must match; terms missing from the corpus weigh the most,
+# so "car loan fees" misses when only home/personal loan pages were ingested
+MIN_TERM_COVERAGE = float(os.getenv("KNOWLEDGE_MIN_COVERAGE", 0.6))
+
+CHUNK_WORDS = 160
+CHUNK_OVERLAP = 40
+
+# Passage selection for summary prompts: smaller windows so only the relevant paragraphs are sent
+PASSAGE_WORDS = 80
+PASSAGE_OVERLAP = 20
+PASSAGE_TOKEN_BUDGET = int(os.getenv("PASSAGE_TOKEN_BUDGET", 700))
+MAX_PASSAGE_OVERLAP = 0.8  # Share of the smaller passage's terms found in a selected one that makes it a repeat
+K1 = 1.2
+B = 0.75
+
+MAGIC = b"KIDXv1\x00\x00"
+POSTING = np.dtype([("doc", "<u4"), ("tf", "<u4")])
+YEAR = re.compile(r"^(19|20)\d{2}$")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens with stopwords and years dropped and plurals folded (same rules as query_index)."""
+    tokens = []
+    for token in re.findall(r"[a-z0-9]+(?:\.[0-9]+)?", text.lower()):
+        if token in STOPWORDS or YEAR.match(token):
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def chunk_text(text: str, words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into overlapping windows of about `words` words, preferring paragraph breaks."""
+    paragraphs = [" ".join(p.split()) for p in re.split(r"\n\s*\n|\r\n\s*\r\n", text)]
+    chunks, current = [], []
+    for paragraph in filter(None, paragraphs):
+        tokens = paragraph.split()
+        if current and len(current) + len(tokens) > words:
+            chunks.append(" ".join(current))
+            current = current[-overlap:] if overlap else []
+        current.extend(tokens)
+        while len(current) > words:
+            chunks.append(" ".join(current[:words]))
+            current = current[words - overlap:]
+    if current and (not chunks or len(current) > overlap):
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def bm25_scores(query_terms, doc_terms: List[List[str]], k1: float = K1, b: float = B) -> np.ndarray:
+    """BM25 score of each tokenized document against the query terms (in-memory, for small candidate sets)."""
+    n = len(doc_terms)
+    if not n:
+        return np.zeros(0)
+    lengths = np.array([len(d) for d in doc_terms], dtype=np.float64)
+    avgdl = lengths.mean() or 1.0
+    counts = [Counter(d) for d in doc_terms]
+    scores = np.zeros(n)
+    for term in set(query_terms):
+        tf = np.array([c.get(term, 0) for c in counts], dtype=np.float64)
+        df = np.count_nonzero(tf)
+        if not df:
+            continue
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        scores += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths / avgdl))
+    return scores
+
+
+def select_passages(query: str, results: List[dict], token_budget: int = PASSAGE_TOKEN_BUDGET) -> str:
+    """
+    Pick the passages of search results that best answer `query`, within `token_budget` tokens.
+
+    Each result's raw_content (or its snippet when there is none) is cut into ~PASSAGE_WORDS-word
+    windows, windows are ranked with BM25 against the query, and the best ones are taken greedily
+    until the budget is spent. Returns the "Title: ...\n<passage>" blocks for the summary prompt.
+    """
+    candidates = []
+    for result in results:
+        text = result.get("raw_content") or result.get("content") or ""
+        for passage in chunk_text(text, PASSAGE_WORDS, PASSAGE_OVERLAP):
+            candidates.append((result.get("title", ""), passage))
+        if result.get("raw_content") and result.get("content"):
+            candidates.append((result.get("title", ""), " ".join(result["content"].split())))
+    if not candidates:
+        return ""
+
+    terms = [tokenize(passage) for _, passage in candidates]
+    scores = bm25_scores(tokenize(query), terms)
+    selected, used, kept_terms = [], 0, []
+    for i in np.argsort(-scores, kind="stable"):
+        title, passage = candidates[i]
+        cost = estimate_tokens(passage) + estimate_tokens(title) + 2
+        if used + cost > token_budget or (scores[i] <= 0 and selected):
+            continue
+        # Overlapping windows and the snippet repeat each other; keep only one of near-duplicates
+        words = set(terms[i])
+        if any(len(words & kept) >= MAX_PASSAGE_OVERLAP * min(len(words), len(kept)) for kept in kept_terms):
+            continue
+        selected.append(f"Title: {title}\n{passage}")
+        kept_terms.append(words)
+        used += cost
+    return "\n\n".join(selected)
+
+
+def build_index(documents, path: str = KNOWLEDGE_INDEX_PATH) -> dict:
+    """
+    Chunk documents and write a BM25 index file.
+
+    Args:
+        documents: Iterable of {"url", "title", "text"}.
+        path (str): Output file; written to a temp file and renamed, so readers never see a partial index.
+    Returns:
+        dict: {"documents", "passages", "terms", "bytes"}
+    File layout: MAGIC | header length (u64) | JSON header (vocabulary, passage table)
+                 | postings (doc u32, tf u32) grouped by term | passage text (UTF-8).
+    """
+    passages, texts, postings = [], [], {}
+    n_documents = 0
+    for document in documents:
+        n_documents += 1
+        for chunk in chunk_text(document["text"]):
+            terms = tokenize(chunk)
+            if not terms:
+                continue
+            doc_id = len(passages)
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).append((doc_id, tf))
+            encoded = chunk.encode()
+            passages.append([document.get("url", ""), document.get("title", ""), len(terms)])
+            texts.append(encoded)
+
+    vocabulary, offset = {}, 0
+    for term in sorted(postings):
+        vocabulary[term] = [offset, len(postings[term])]
+        offset += len(postings[term])
+    posting_array = np.array([p for term in sorted(postings) for p in postings[term]], dtype=POSTING)
+
+    text_offsets, position = [], 0
+    for encoded in texts:
+        text_offsets.append([position, len(encoded)])
+        position += len(encoded)
+
+    lengths = [p[2] for p in passages]
+    header = json.dumps({
+        "passages": [p + o for p, o in zip(passages, text_offsets)],
+        "vocabulary": vocabulary,
+        "avgdl": (sum(lengths) / len(lengths)) if lengths else 1.0,
+    }, separators=(",", ":")).encode()
+    pad = (-(len(MAGIC) + 8 + len(header))) % POSTING.itemsize
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header) + pad))
+        f.write(header + b" " * pad)
+        f.write(posting_array.tobytes())
+        f.writelines(texts)
+    os.replace(tmp, path)
+    return {"documents": n_documents, "passages": len(passages), "terms": len(vocabulary), "bytes": os.path.getsize(path)}
+
+
+class KnowledgeIndex:
+    """
+    Read-only BM25 index over passages of product pages, memory-mapped from build_index()'s file.
+    Only the header is parsed up front; postings and passage text are read from the mapping on demand.
+    """
+
+    def __init__(self, path: str = KNOWLEDGE_INDEX_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a knowledge index")
+            header_length = struct.unpack("<Q", f.read(8))[0]
+            header = json.loads(f.read(header_length))
+        self.passages = header["passages"]  # [url, title, length, text offset, text length]
+        self.vocabulary = header["vocabulary"]
+        self.avgdl = header["avgdl"] or 1.0
+        self.lengths = np.array([p[2] for p in self.passages], dtype=np.float64)
+
+        data_start = len(MAGIC) + 8 + header_length
+        n_postings = sum(count for _, count in self.vocabulary.values())
+        self._postings = np.memmap(path, dtype=POSTING, mode="r", offset=data_start, shape=(n_postings,)) \
+            if n_postings else np.zeros(0, dtype=POSTING)
+        self._text_start = data_start + n_postings * POSTING.itemsize
+        self._text = np.memmap(path, dtype=np.uint8, mode="r", offset=self._text_start) \
+            if os.path.getsize(path) > self._text_start else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.passages)
+
+    def passage_text(self, doc_id: int) -> str:
+        _, _, _, offset, length = self.passages[doc_id]
+        return bytes(self._text[offset:offset + length]).decode()
+
+    def search(self, query: str, k: int = 5) -> List[dict]:
+        """Top-k passages by BM25, each {"url", "title", "content", "score", "coverage"}."""
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        n = len(self)
+        if not n or not any(t in self.vocabulary for t in query_terms):
+            return []
+
+        scores = np.zeros(n)
+        matched = np.zeros(n)
+        total_weight = 0.0
+        for term in query_terms:
+            offset, df = self.vocabulary.get(term, (0, 0))
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            total_weight += idf
+            if not df:
+                continue
+            block = self._postings[offset:offset + df]
+            docs = block["doc"].astype(np.int64)
+            tf = block["tf"].astype(np.float64)
+            scores[docs] += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * self.lengths[docs] / self.avgdl))
+            matched[docs] += idf
+
+        top = np.argsort(-scores)[:k]
+        return [
+            {
+                "url": self.passages[i][0],
+                "title": self.passages[i][1],
+                "content": self.passage_text(i),
+                "score": round(float(scores[i]), 4),
+                "coverage": round(float(matched[i] / total_weight), 3),
+            }
+            for i in top if scores[i] > 0
+        ]
+
+
+_index = None
+_index_mtime = None
+_lock = threading.Lock()
+
+
+def load_index(path: str = KNOWLEDGE_INDEX_PATH) -> Optional[KnowledgeIndex]:
+    """The shared index, reopened when the file is rebuilt; None if no index has been built."""
+    global _index, _index_mtime
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _lock:
+        if _index is None or _index.path != path or _index_mtime != mtime:
+            _index, _index_mtime = KnowledgeIndex(path), mtime
+        return _index
+
+
+def knowledge_search(query: str, k: int = 3) -> Optional[dict]:
+    """
+    Answer a search from the local index in the same shape as a Tavily response
+    ({"query", "results": [{"title", "url", "content", "score"}]}).
+    Returns None on a miss (no index, or the best passage covers too little of the query).
+    """
+    index = load_index()
+    if index is None:
+        return None
+    results = index.search(query, k)
+    if not results or results[0]["coverage"] < MIN_TERM_COVERAGE:
+        return None
+    return {"query": query, "results": results, "source": "knowledge_index"}
@@ -0,0 +1,143 @@
+import numpy as np
+from tools.emi_calculator_tool import emi_batch
+
+MAX_FOIR = 0.5          # Max share of monthly income that can go to EMIs (fixed obligation to income ratio)
+RATE_STEP = 0.25        # Rate grid resolution, % p.a.
+AMOUNT_STEPS = 20       # Amount levels evaluated between the product minimum and the cap
+
+# Product constraints per loan type. rate_bands: (min credit score, best rate, list rate) in % p.a.,
+# highest score first. An internal approximation of the rate card, so offers built on it are indicative.
+PRODUCTS = {
+    "personal": {
+        "min_amount": 40000, "max_amount": 3500000, "tenures": range(12, 73, 12),
+        "rate_bands": [(750, 10.99, 13.5), (700, 12.5, 16.0), (650, 15.0, 20.0), (0, 18.0, 24.0)],
+    },
+    "home": {
+        "min_amount": 500000, "max_amount": 50000000, "tenures": range(60, 361, 60),
+        "rate_bands": [(750, 8.75, 9.75), (700, 9.25, 10.5), (650, 10.0, 11.5), (0, 11.0, 12.5)],
+    },
+    "car": {
+        "min_amount": 100000, "max_amount": 5000000, "tenures": range(12, 85, 12),
+        "rate_bands": [(750, 9.5, 11.0), (700, 10.5, 12.5), (650, 12.0, 14.5), (0, 14.0, 17.0)],
+    },
+    "business": {
+        "min_amount": 100000, "max_amount": 7500000, "tenures": range(12, 61, 12),
+        "rate_bands": [(750, 12.0, 15.0), (700, 14.0, 18.0), (650, 16.5, 21.0), (0, 19.0, 25.0)],
+    },
+    "education": {
+        "min_amount": 100000, "max_amount": 3000000, "tenures": range(12, 121, 12),
+        "rate_bands": [(750, 10.0, 12.0), (700, 11.0, 13.5), (650, 12.5, 15.0), (0, 14.0, 17.0)],
+    },
+}
+DEFAULT_PRODUCT = "personal"
+
+
+def rate_band(product: dict, credit_score: int):
+    """(best rate, list rate) for a credit score."""
+    for min_score, best, list_rate in product["rate_bands"]:
+        if credit_score >= min_score:
+            return best, list_rate
+    return product["rate_bands"][-1][1:]
+
+
+def rate_grid(best_rate: float, list_rate: float) -> np.ndarray:
+    """Rates an offer can be priced at, best rate first, in RATE_STEP steps up to the list rate."""
+    return np.unique(np.append(np.arange(best_rate, list_rate, RATE_STEP), list_rate))
+
+
+def monthly_income(profile: dict):
+    if profile.get("income"):
+        return float(profile["income"])
+    if profile.get("annual_income"):
+        return float(profile["annual_income"]) / 12
+    return None
+
+
+def optimize_offers(profile: dict, top_n: int = 3, max_foir: float = MAX_FOIR) -> list:
+    """
+    Evaluate every (amount, rate, tenure) candidate for the user's loan type in one vectorized pass
+    and return the best feasible offers.
+
+    Feasible means: amount within product limits and the pre-approved amount, tenure allowed for the
+    product, rate within the credit score's band, and EMI within max_foir of monthly income minus
+    existing EMIs (the income check is skipped when income is unknown).
+
+    Offers are ranked by how much of the requested amount they cover, then by lowest EMI at the
+    opening rate, keeping one offer per tenure. Loan types without a rate card in PRODUCTS get no
+    offers; an unset loan type is priced as DEFAULT_PRODUCT.
+
+    Returns:
+        list[dict]: amount, tenure_months, rate (highest affordable rate in the band, the opening
+        offer), floor_rate (best rate the score allows), emi, floor_emi and total_interest, best first.
+    """
+    product = PRODUCTS.get(str(profile.get("loan_type") or DEFAULT_PRODUCT).lower())
+    if not profile.get("credit_score") or product is None:
+        # No rate card for this loan type (e.g. gold): nothing we can quote
+        return []
+
+    best_rate, list_rate = rate_band(product, int(profile["credit_score"]))
+
+    cap = product["max_amount"]
+    if profile.get("pre_approved_amount"):
+        cap = min(cap, float(profile["pre_approved_amount"]))
+    if cap < product["min_amount"]:
+        return []
+    requested = float(profile.get("loan_amount") or cap)
+
+    offered = max(product["min_amount"], min(requested, cap))
+    amounts = np.unique(np.append(np.linspace(product["min_amount"], cap, AMOUNT_STEPS), offered))
+    rates = rate_grid(best_rate, list_rate)
+    tenures = np.asarray(list(product["tenures"]), dtype=float)
+
+    # Grid axes: (amount, rate, tenure)
+    result = emi_batch(amounts[:, None, None], rates[None, :, None], tenures[None, None, :])
+    emi = result["emi"]
+
+    feasible = np.ones(emi.shape, dtype=bool)
+    income = monthly_income(profile)
+    if income:
+        budget = income * max_foir - float(profile.get("existing_emi", 0) or 0)
+        feasible &= emi <= budget
+
+    # An (amount, tenure) is offerable if some rate in the band is affordable; we open at the
+    # highest affordable rate and can negotiate down to the band's best rate
+    offerable = feasible.any(axis=1)
+    if not offerable.any():
+        return []
+    open_idx = len(rates) - 1 - np.argmax(feasible[:, ::-1, :], axis=1)
+
+    coverage = np.minimum(amounts, requested) / requested
+    amount_idx, tenure_idx = np.nonzero(offerable)
+    opening_emi = emi[amount_idx, open_idx[amount_idx, tenure_idx], tenure_idx]
+    order = np.lexsort((opening_emi, -coverage[amount_idx]))
+
+    offers, seen_tenures = [], set()
+    for i in order:
+        a, t = amount_idx[i], tenure_idx[i]
+        r = open_idx[a, t]
+        if t in seen_tenures:
+            continue
+        seen_tenures.add(t)
+        offers.append({
+            "amount": int(round(amounts[a])),
+            "tenure_months": int(tenures[t]),
+            "rate": round(float(rates[r]), 2),
+            "floor_rate": round(float(rates[0]), 2),
+            "emi": round(float(emi[a, r, t]), 0),
+            "floor_emi": round(float(emi[a, 0, t]), 0),
+            "total_interest": round(float(result["total_interest"][a, r, t]), 0),
+        })
+        if len(offers) == top_n:
+            break
+    return offers
+
+
+def format_offers(offers: list) -> str:
+    """Offer table for the sales prompt."""
+    lines = []
+    for i, o in enumerate(offers, 1):
+        lines.append(
+            f"{i}. ₹{o['amount']:,} for {o['tenure_months']} months at {o['rate']}% p.a. → EMI ₹{o['emi']:,.0f} "
+            f"(total interest ₹{o['total_interest']:,.0f}); can go down to {o['floor_rate']}% → EMI ₹{o['floor_emi']:,.0f}"
+        )
+    return "\n".join(lines)
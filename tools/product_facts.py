@@ -0,0 +1,273 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import List, Optional, TypedDict
+from utils.disk_cache import DiskCache, CACHE_DIR
+from utils.profile_extractor import LOAN_TYPE, LOAN_TYPES, AMOUNT, UNIT_MULTIPLIERS
+
+
+class ProductFacts(TypedDict, total=False):
+    loan_type: str
+    rate_min: float              # % p.a.
+    rate_max: float
+    processing_fee_max: float    # % of loan amount
+    tenure_min_months: int
+    tenure_max_months: int
+    amount_min: int              # rupees
+    amount_max: int
+    documents: List[str]
+    eligibility: List[str]
+    sources: List[str]           # URLs the facts were extracted from
+    version: int
+    updated_at: float
+
+
+# Persisted without TTL or size limit: entries change only when a refresh sees a source page change,
+# and the "pages" record and "<loan_type>@v<n>" history must never be evicted
+facts_store = DiskCache(
+    os.getenv("PRODUCT_FACTS_PATH", os.path.join(CACHE_DIR, "product_facts.sqlite")),
+    ttl=None,
+    max_entries=None,
+    table="product_facts",
+)
+
+RATE = re.compile(r"(\d{1,2}(?:\.\d{1,2})?)\s*%\s*(?:p\.?\s?a\.?|per annum|onwards|\*)?", re.IGNORECASE)
+FEE = re.compile(r"processing (?:fee|charge)s?[^.\n%]{0,60}?(\d{1,2}(?:\.\d{1,2})?)\s*%", re.IGNORECASE)
+TENURE_RANGE = re.compile(
+    r"(?:(\d{1,3})\s*(months?|years?)?\s*(?:to|-|–|up to)\s*)?(?:up to\s*)?(\d{1,3})\s*(months?|years?)", re.IGNORECASE
+)
+DOCUMENTS = {
+    "PAN card": r"\bpan\b",
+    "Aadhaar": r"aadha+r",
+    "Passport": r"passport",
+    "Salary slips": r"salary slips?|pay ?slips?",
+    "Bank statements": r"bank statements?",
+    "Income tax returns": r"\bitr\b|income tax returns?",
+    "Form 16": r"form ?16",
+    "Property documents": r"property (?:documents|papers)",
+    "Business proof": r"business (?:proof|registration)|gst registration",
+    "Admission letter": r"admission letter",
+    "Photographs": r"photographs?",
+}
+ELIGIBILITY = re.compile(
+    r"[^.\n]*\b(aged?|years of age|minimum (?:net )?(?:monthly )?income|cibil|credit score|salaried|self[- ]employed)\b[^.\n]*",
+    re.IGNORECASE,
+)
+
+# Topics a question can ask about, and the fact fields needed to answer each
+TOPICS = {
+    "rate": (re.compile(r"interest|\brates?\b|\broi\b|\bapr\b", re.IGNORECASE), ("rate_min", "rate_max")),
+    "fee": (re.compile(r"processing (?:fee|charge)s?|\bfees?\b", re.IGNORECASE), ("processing_fee_max",)),
+    "tenure": (re.compile(r"tenure|duration|how long|repayment (?:period|term)", re.IGNORECASE),
+               ("tenure_min_months", "tenure_max_months")),
+    "amount": (re.compile(r"how much|loan amount|maximum amount|minimum amount|\blimit\b", re.IGNORECASE),
+               ("amount_min", "amount_max")),
+    "documents": (re.compile(r"document|paperwork|papers|\bkyc\b|proofs?", re.IGNORECASE), ("documents",)),
+    "eligibility": (re.compile(r"eligib|qualify|criteria", re.IGNORECASE), ("eligibility",)),
+}
+# Anything beyond the tabulated facts (comparisons, offers, processes, charges other than the
+# processing fee) goes to search
+UNTABULATED = re.compile(
+    r"compare|\bvs\b|versus|\boffers?\b|discount|prepay|foreclos|\bapply\b|\bprocess\b|status|insurance|"
+    r"\blate\b|penal|bounce|stamp duty|(?<!processing )\bcharges?\b",
+    re.IGNORECASE,
+)
+
+_lock = threading.Lock()
+STATS = {"hits": 0, "misses": 0}
+
+
+def _count(key: str) -> None:
+    with _lock:
+        STATS[key] += 1
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(" ".join(text.split()).encode()).hexdigest()
+
+
+def page_loan_type(url: str, title: str) -> Optional[str]:
+    """Loan type a product page is about, from its URL slug or title (e.g. /home-loan.html)."""
+    for source in (url, title):
+        match = LOAN_TYPE.search(re.sub(r"[-_/]+", " ", source or ""))
+        if match:
+            return next(name for name in LOAN_TYPES if match.group(name))
+    return None
+
+
+def _months(value: str, unit: str) -> int:
+    return int(value) * (12 if unit.lower().startswith("year") else 1)
+
+
+def _rupees(match) -> Optional[int]:
+    value = float(match.group("value").replace(",", ""))
+    unit = (match.group("unit") or "").lower().rstrip("s")
+    if unit:
+        value *= UNIT_MULTIPLIERS.get(unit, 1)
+    elif not match.group("currency"):
+        return None
+    return int(value)
+
+
+def extract_facts(text: str) -> ProductFacts:
+    """Facts stated in one page of product text (only fields that were found)."""
+    facts = ProductFacts()
+    sentences = re.split(r"(?<=[.!?])\s+|\n+", text)
+
+    rates = [float(m.group(1)) for s in sentences if re.search(r"interest|rate", s, re.IGNORECASE)
+             for m in RATE.finditer(s) if not FEE.search(s) and 1 <= float(m.group(1)) <= 40]
+    if rates:
+        facts["rate_min"], facts["rate_max"] = min(rates), max(rates)
+
+    fees = [float(m.group(1)) for m in FEE.finditer(text)]
+    if fees:
+        facts["processing_fee_max"] = max(fees)
+
+    tenures = []
+    for s in sentences:
+        if re.search(r"tenure|repay", s, re.IGNORECASE):
+            for m in TENURE_RANGE.finditer(s):
+                low, low_unit, high, high_unit = m.groups()
+                tenures.append(_months(high, high_unit))
+                if low:
+                    tenures.append(_months(low, low_unit or high_unit))
+    if tenures:
+        facts["tenure_min_months"], facts["tenure_max_months"] = min(tenures), max(tenures)
+
+    amounts = [a for s in sentences if re.search(r"loan amount|borrow|amounts? (?:from|of|up to)", s, re.IGNORECASE)
+               for a in map(_rupees, AMOUNT.finditer(s)) if a and a >= 1000]
+    if amounts:
+        facts["amount_min"], facts["amount_max"] = min(amounts), max(amounts)
+
+    documents = [name for name, pattern in DOCUMENTS.items() if re.search(pattern, text, re.IGNORECASE)]
+    if documents:
+        facts["documents"] = documents
+
+    eligibility = list(dict.fromkeys(" ".join(m.group(0).split()) for m in ELIGIBILITY.finditer(text)))
+    if eligibility:
+        facts["eligibility"] = [e for e in eligibility if len(e) <= 200][:5]
+    return facts
+
+
+def merge_facts(loan_type: str, pages: List[dict]) -> ProductFacts:
+    """Combine per-page facts for one loan type: widest ranges, union of lists."""
+    merged = ProductFacts(loan_type=loan_type, sources=sorted(p["url"] for p in pages))
+    for page in pages:
+        for key, value in page["facts"].items():
+            if key.endswith("_min"):
+                merged[key] = min(value, merged.get(key, value))
+            elif key.endswith("_max"):
+                merged[key] = max(value, merged.get(key, value))
+            elif isinstance(value, list):
+                merged[key] = list(dict.fromkeys(merged.get(key, []) + value))
+            else:
+                merged[key] = value
+    return merged
+
+
+def refresh_facts(documents) -> dict:
+    """
+    Incrementally update the fact table from product pages ({"url", "title", "text"}).
+
+    Pages whose content hash is unchanged are skipped. Loan types with a new or changed
+    source page are re-merged, and their version is bumped only if the facts actually changed.
+    Previous versions stay readable as "<loan_type>@v<n>".
+    """
+    pages = facts_store.get("pages") or {}  # url -> {"hash", "loan_type", "facts"}
+    changed_types = set()
+    seen = 0
+    for document in documents:
+        loan_type = page_loan_type(document.get("url", ""), document.get("title", ""))
+        if not loan_type:
+            continue
+        seen += 1
+        digest = content_hash(document["text"])
+        previous = pages.get(document["url"])
+        if previous and previous["hash"] == digest:
+            continue
+        pages[document["url"]] = {"hash": digest, "loan_type": loan_type, "facts": extract_facts(document["text"])}
+        changed_types.add(loan_type)
+        if previous:
+            changed_types.add(previous["loan_type"])
+
+    updated = []
+    for loan_type in sorted(changed_types):
+        merged = merge_facts(loan_type, [p | {"url": url} for url, p in pages.items() if p["loan_type"] == loan_type])
+        current = facts_store.get(loan_type)
+        comparable = {k: v for k, v in (current or {}).items() if k not in ("version", "updated_at")}
+        if comparable == merged:
+            continue
+        merged["version"] = (current or {}).get("version", 0) + 1
+        merged["updated_at"] = time.time()
+        if current:
+            facts_store.set(f"{loan_type}@v{current['version']}", current)
+        facts_store.set(loan_type, merged)
+        updated.append(f"{loan_type} v{merged['version']}")
+
+    facts_store.set("pages", pages)
+    return {"pages_seen": seen, "loan_types_changed": sorted(changed_types), "updated": updated}
+
+
+def get_facts(loan_type: str) -> Optional[ProductFacts]:
+    return facts_store.get(loan_type) if loan_type else None
+
+
+def _inr(amount: int) -> str:
+    if amount >= 1e7:
+        return f"₹{amount / 1e7:g} crore"
+    if amount >= 1e5:
+        return f"₹{amount / 1e5:g} lakh"
+    return f"₹{amount:,}"
+
+
+def _range(low, high, fmt, single: str) -> str:
+    """"a to b", or "<single> a" when the sources only state one bound (e.g. "starting from 10.99%")."""
+    return f"{single} {fmt(low)}" if low == high else f"{fmt(low)} to {fmt(high)}"
+
+
+def format_facts(facts: ProductFacts, topics) -> str:
+    name = facts["loan_type"].replace("_", " ").title()
+    lines = [f"=== {name} Loan facts (fact table v{facts['version']}) ==="]
+    if "rate" in topics:
+        lines.append(f"- Interest rate: {_range(facts['rate_min'], facts['rate_max'], '{:g}%'.format, 'from')} p.a.")
+    if "fee" in topics:
+        lines.append(f"- Processing fee: up to {facts['processing_fee_max']:g}% of the loan amount (plus GST)")
+    if "tenure" in topics:
+        tenure = _range(facts['tenure_min_months'], facts['tenure_max_months'], '{} months'.format, 'up to')
+        lines.append(f"- Tenure: {tenure}")
+    if "amount" in topics:
+        lines.append(f"- Loan amount: {_range(facts['amount_min'], facts['amount_max'], _inr, 'up to')}")
+    if "documents" in topics:
+        lines.append(f"- Documents required: {', '.join(facts['documents'])}")
+    if "eligibility" in topics:
+        lines.append("- Eligibility: " + "; ".join(facts["eligibility"]))
+    lines.append(f"Sources: {', '.join(facts['sources'])}")
+    return "\n".join(lines) + "\n"
+
+
+def answer_from_facts(question: str, loan_type: str = None) -> Optional[str]:
+    """
+    Answer a product question from the fact table, or None if it needs a search.
+
+    The question must name (or the profile must supply) a loan type, ask only about tabulated
+    topics (rate, fee, tenure, amount, documents, eligibility), and every asked topic must have facts.
+    """
+    match = LOAN_TYPE.search(question)
+    if match:
+        loan_type = next(name for name in LOAN_TYPES if match.group(name))
+    topics = [topic for topic, (pattern, _) in TOPICS.items() if pattern.search(question)]
+    facts = get_facts(loan_type)
+    if not facts or not topics or UNTABULATED.search(question) or any(
+        field not in facts for topic in topics for field in TOPICS[topic][1]
+    ):
+        _count("misses")
+        return None
+    _count("hits")
+    return format_facts(facts, topics)
+
+
+def facts_stats() -> dict:
+    with _lock:
+        return dict(STATS)
@@ -0,0 +1,152 @@
+import os
+import random
+import re
+import threading
+import zlib
+from collections import defaultdict
+from typing import Optional, Tuple
+from utils.disk_cache import DiskCache, CACHE_DIR
+
+SIMILARITY_THRESHOLD = float(os.getenv("SEARCH_SIMILARITY_THRESHOLD", 0.75))
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+
+STOPWORDS = {
+    "a", "an", "the", "for", "of", "to", "in", "on", "and", "or", "with", "what", "is", "are",
+    "how", "do", "does", "my", "i", "me", "can", "by", "at", "from", "about", "tata", "capital",
+}
+_YEAR = re.compile(r"^(19|20)\d{2}$")
+
+_rng = random.Random(1729)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def query_tokens(query: str) -> frozenset:
+    """
+    Normalized token set used as the shingle set for a query.
+    Stopwords and years are dropped and plurals folded, so
+    "home loan interest rates 2024" and "interest rate for home loans" share one set.
+    """
+    tokens = set()
+    for token in re.findall(r"[a-z0-9]+", query.lower()):
+        if token in STOPWORDS or _YEAR.match(token):
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.add(token)
+    return frozenset(tokens)
+
+
+def minhash(tokens: frozenset) -> Tuple[int, ...]:
+    hashes = [zlib.crc32(t.encode()) for t in tokens]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class QueryIndex:
+    """
+    MinHash/LSH index over previously answered search queries and their summaries.
+    Lookups only compare against LSH candidates, so cost stays flat as the index grows.
+    Summaries are persisted in a DiskCache table and the index is rebuilt from it on startup.
+    """
+
+    def __init__(self, store: DiskCache, threshold: float = SIMILARITY_THRESHOLD):
+        self.store = store
+        self.threshold = threshold
+        self.reused = 0
+        self.lookups = 0
+        self._tokens = {}
+        self._buckets = defaultdict(set)
+        self._lock = threading.Lock()
+        for key, _ in store.items():
+            self._index(key)
+
+    def _bands(self, signature):
+        return [(i, signature[i * ROWS:(i + 1) * ROWS]) for i in range(BANDS)]
+
+    def _index(self, key: str) -> None:
+        tokens = query_tokens(key)
+        if not tokens or key in self._tokens:
+            return
+        self._tokens[key] = tokens
+        for band in self._bands(minhash(tokens)):
+            self._buckets[band].add(key)
+
+    def _remove(self, key: str) -> None:
+        tokens = self._tokens.pop(key, None)
+        if tokens is None:
+            return
+        for band in self._bands(minhash(tokens)):
+            self._buckets[band].discard(key)
+
+    def add(self, query: str, summary: str) -> None:
+        """Remember the summary produced for a query."""
+        key = " ".join(sorted(query_tokens(query)))
+        if not key:
+            return
+        self.store.set(key, {"query": query, "summary": summary})
+        with self._lock:
+            self._index(key)
+
+    def lookup(self, query: str) -> Optional[dict]:
+        """
+        Find a previously answered query similar to this one.
+
+        A cached query qualifies only if it covers every term of this one (and is similar above the
+        threshold), so a narrower cached answer ("home loan rate") never answers a broader question
+        ("home loan rate and processing fee").
+
+        Returns:
+            dict | None: {"query", "summary", "similarity"} for the best match above the threshold.
+        """
+        tokens = query_tokens(query)
+        if not tokens:
+            return None
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for band in self._bands(minhash(tokens)):
+                candidates |= self._buckets.get(band, set())
+            scored = sorted(
+                ((jaccard(tokens, self._tokens[key]), key) for key in candidates if tokens <= self._tokens[key]),
+                reverse=True,
+            )
+
+        for similarity, key in scored:
+            if similarity < self.threshold:
+                break
+            entry = self.store.get(key)
+            if entry is None:
+                # Expired or evicted from the store, forget it here too
+                with self._lock:
+                    self._remove(key)
+                continue
+            with self._lock:
+                self.reused += 1
+            return {**entry, "similarity": round(similarity, 3)}
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "indexed_queries": len(self._tokens),
+            "lookups": self.lookups,
+            "reused": self.reused,
+        }
+
+
+query_index = QueryIndex(
+    DiskCache(
+        os.getenv("SEARCH_CACHE_PATH", os.path.join(CACHE_DIR, "search_cache.sqlite")),
+        ttl=float(os.getenv("SEARCH_CACHE_TTL", 24 * 3600)),
+        max_entries=int(os.getenv("QUERY_INDEX_MAX_ENTRIES", 50000)),
+        table="summaries",
+    )
+)
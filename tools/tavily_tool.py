@@ -1,9 +1,15 @@
 from langchain_tavily import TavilySearch
 import dotenv
+import hashlib
+import json
+import os
+import re
+from utils.disk_cache import DiskCache, CACHE_DIR
+from utils.rate_limiter import RateLimitedTool, tavily_scheduler
 
 dotenv.load_dotenv()
 
-tavily_tool = TavilySearch(
+TAVILY_CONFIG = dict(
     max_results = 2,
     topic = "finance",
     include_answer=True,
@@ -16,4 +22,51 @@ tavily_tool = TavilySearch(
     exclude_domains = ["https://www.tatacapital.com/personal-loan/eligibility-calculator.html", "https://www.tatacapital.com/blog/"]
 )
 
-# print(tavily_tool.invoke({"query": "personal loan interest rates and repayment tenure for education expenses"}))
\ No newline at end of file
+# Calls go through the shared Tavily scheduler (rate limit, retries on 429/5xx)
+tavily_tool = RateLimitedTool(TavilySearch(**TAVILY_CONFIG), tavily_scheduler)
+
+# Search results are cached on disk so repeated product questions across sessions skip the network
+search_cache = DiskCache(
+    os.getenv("SEARCH_CACHE_PATH", os.path.join(CACHE_DIR, "search_cache.sqlite")),
+    ttl=float(os.getenv("SEARCH_CACHE_TTL", 24 * 3600)),
+    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", 5000)),
+)
+
+# Only the best passages of a page reach the summary prompt, so don't keep whole pages in the cache
+# (a live search still hands its full pages to passage selection)
+RAW_CONTENT_MAX_CHARS = int(os.getenv("RAW_CONTENT_MAX_CHARS", 20000))
+
+_CONFIG_FINGERPRINT = hashlib.sha256(json.dumps(TAVILY_CONFIG, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so trivially different queries share a key."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+def cached_search(query: str, bypass_cache: bool = False) -> dict:
+    """
+    Run a Tavily search through the on-disk cache.
+
+    Args:
+        query (str): The full search query.
+        bypass_cache (bool): Skip the cache lookup and force a live search (the result is still stored).
+    Returns:
+        dict: The Tavily response.
+    """
+    key = f"{_CONFIG_FINGERPRINT}:{normalize_query(query)}"
+    if not bypass_cache:
+        cached = search_cache.get(key)
+        if cached is not None:
+            return {**cached, "source": "search_cache"}
+
+    result = tavily_tool.invoke({"query": query})
+    if isinstance(result, dict) and "error" not in result:
+        # The live result keeps whole pages for passage selection; only the cached copy is capped
+        search_cache.set(key, {**result, "results": [
+            {**item, "raw_content": item["raw_content"][:RAW_CONTENT_MAX_CHARS]} if item.get("raw_content") else item
+            for item in result.get("results", [])
+        ]})
+    return result
+
+# print(tavily_tool.invoke({"query": "personal loan interest rates and repayment tenure for education expenses"}))
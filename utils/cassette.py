@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from langchain_core.messages import AIMessage, AIMessageChunk
+from utils.clients import swap_clients
+import llm as llm_module
+import tools.tavily_tool as tavily_module
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a call was never recorded."""
+
+
+def _request_key(channel: str, request) -> str:
+    if isinstance(request, list):
+        request = [(getattr(m, "type", ""), getattr(m, "content", m)) for m in request]
+    payload = json.dumps({"channel": channel, "request": request}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class Cassette:
+    """
+    Ordered record of LLM and search responses keyed by request.
+    Identical requests keep their responses in call order, so replay reproduces a run exactly.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.interactions = defaultdict(list)
+        self._replay = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        cassette = cls(path)
+        with open(path) as f:
+            data = json.load(f)
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version: {data.get('version')}")
+        cassette.interactions.update(data["interactions"])
+        cassette._replay = {key: deque(values) for key, values in cassette.interactions.items()}
+        return cassette
+
+    def save(self) -> None:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self._lock:
+            data = {"version": CASSETTE_VERSION, "interactions": dict(self.interactions)}
+        with open(self.path, "w") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    def record(self, channel: str, request, response) -> None:
+        with self._lock:
+            self.interactions[_request_key(channel, request)].append(response)
+
+    def play(self, channel: str, request):
+        key = _request_key(channel, request)
+        with self._lock:
+            queue = self._replay.get(key)
+            if not queue:
+                raise CassetteMiss(f"No recorded {channel} response for request {key[:12]}")
+            return queue.popleft()
+
+
+class CassetteLLM:
+    """Chat model stand-in that records (wrapping `model`) or replays (model=None) responses."""
+
+    def __init__(self, cassette: Cassette, channel: str, model=None):
+        self.cassette = cassette
+        self.channel = channel
+        self.model = model
+
+    def invoke(self, prompt, config=None, **kwargs) -> AIMessage:
+        if self.model is None:
+            return AIMessage(content=self.cassette.play(self.channel, prompt))
+        if config is not None:
+            kwargs["config"] = config
+        response = self.model.invoke(prompt, **kwargs)
+        self.cassette.record(self.channel, prompt, str(response.content))
+        return response
+
+    def batch(self, prompts, config=None, return_exceptions=False, **kwargs):
+        results = []
+        for prompt in prompts:
+            try:
+                results.append(self.invoke(prompt))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results.append(e)
+        return results
+
+    def stream(self, prompt, config=None, **kwargs):
+        if self.model is None:
+            yield AIMessageChunk(content=self.cassette.play(self.channel, prompt))
+            return
+        if config is not None:
+            kwargs["config"] = config
+        content = ""
+        for chunk in self.model.stream(prompt, **kwargs):
+            content += str(chunk.content)
+            yield chunk
+        self.cassette.record(self.channel, prompt, content)
+
+    def with_config(self, *args, **kwargs):
+        if self.model is None:
+            return self
+        return CassetteLLM(self.cassette, self.channel, self.model.with_config(*args, **kwargs))
+
+
+class CassetteSearch:
+    """Search tool stand-in that records (wrapping `tool`) or replays (tool=None) results."""
+
+    def __init__(self, cassette: Cassette, tool=None):
+        self.cassette = cassette
+        self.tool = tool
+
+    def invoke(self, payload, config=None, **kwargs):
+        if self.tool is None:
+            return self.cassette.play("search", payload)
+        result = self.tool.invoke(payload, config, **kwargs) if config is not None else self.tool.invoke(payload, **kwargs)
+        self.cassette.record("search", payload, result)
+        return result
+
+
+@contextmanager
+def cassette_mode(record_path: str = None, replay_path: str = None):
+    """
+    Record every LLM and search call to `record_path`, or replay them from `replay_path`.
+    With neither path set this is a no-op.
+    """
+    if not record_path and not replay_path:
+        yield None
+        return
+
+    if replay_path:
+        cassette = Cassette.load(replay_path)
+        with swap_clients(
+            llm=CassetteLLM(cassette, "llm"),
+            cached_llm=CassetteLLM(cassette, "cached_llm"),
+            search=CassetteSearch(cassette),
+        ):
+            yield cassette
+        return
+
+    cassette = Cassette(record_path)
+    try:
+        with swap_clients(
+            llm=CassetteLLM(cassette, "llm", llm_module.llm),
+            cached_llm=CassetteLLM(cassette, "cached_llm", llm_module.cached_llm),
+            search=CassetteSearch(cassette, tavily_module.tavily_tool),
+        ):
+            yield cassette
+    finally:
+        cassette.save()
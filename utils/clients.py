@@ -0,0 +1,46 @@
+import importlib
+from contextlib import contextmanager
+
+# Every module-level name that holds an LLM or search client. Agents bind these at import
+# time (`from llm import llm`), so swapping a client means rebinding each of these names.
+LLM_SLOTS = [
+    ("agents.agents", "llm"),
+    ("agents.feedback_agent", "llm"),
+    ("agents.search_agent", "llm"),
+    ("agents.user_agent", "llm"),
+    ("utils.history_summary", "llm"),
+]
+CACHED_LLM_SLOTS = [
+    ("agents.agents", "cached_llm"),
+    ("utils.user_profile", "cached_llm"),
+]
+SEARCH_SLOTS = [
+    ("tools.tavily_tool", "tavily_tool"),
+]
+
+
+def _rebind(slots, client, saved):
+    for module_name, attr in slots:
+        module = importlib.import_module(module_name)
+        saved.append((module, attr, getattr(module, attr)))
+        setattr(module, attr, client)
+
+
+@contextmanager
+def swap_clients(llm=None, cached_llm=None, search=None):
+    """
+    Temporarily replace the LLM / memoized LLM / search clients used by every agent.
+    Any client left as None is not touched. Originals are restored on exit.
+    """
+    saved = []
+    try:
+        if llm is not None:
+            _rebind(LLM_SLOTS, llm, saved)
+        if cached_llm is not None:
+            _rebind(CACHED_LLM_SLOTS, cached_llm, saved)
+        if search is not None:
+            _rebind(SEARCH_SLOTS, search, saved)
+        yield
+    finally:
+        for module, attr, original in reversed(saved):
+            setattr(module, attr, original)
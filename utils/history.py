@@ -0,0 +1,55 @@
+import time
+from typing import List, Optional, TypedDict
+
+
+class Turn(TypedDict):
+    role: str       # "assistant", "user" or "system"
+    text: str
+    ts: float       # Unix timestamp when the turn was added
+    tokens: int     # Rough token count of text
+
+
+ROLE_LABELS = {
+    "assistant": "Loan Assistant",
+    "user": "User",
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def add_turn(history: List[Turn], role: str, text: str) -> Turn:
+    """Append a turn to the conversation log and return it."""
+    turn = {"role": role, "text": text, "ts": time.time(), "tokens": estimate_tokens(text)}
+    history.append(turn)
+    return turn
+
+
+def latest_turn(history: List[Turn], role: str) -> Optional[Turn]:
+    """Most recent turn by `role`, scanning back only as far as needed."""
+    for turn in reversed(history):
+        if turn["role"] == role:
+            return turn
+    return None
+
+
+def latest_user_message(history: List[Turn]) -> str:
+    turn = latest_turn(history, "user")
+    return turn["text"] if turn else ""
+
+
+def render_turn(turn: Turn) -> str:
+    if turn["role"] == "system":
+        return f"[System Note: {turn['text']}]"
+    return f"{ROLE_LABELS.get(turn['role'], turn['role'])}: {turn['text']}"
+
+
+def render_history(history: List[Turn]) -> str:
+    """Plain-text transcript used inside prompts and for printing."""
+    return "\n".join(render_turn(turn) for turn in history)
+
+
+def history_tokens(history: List[Turn]) -> int:
+    return sum(turn["tokens"] for turn in history)
@@ -0,0 +1,98 @@
+import os
+import threading
+from state import State
+from llm import llm
+from utils.history import estimate_tokens, history_tokens, render_history
+
+KEEP_RECENT_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", 6))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 1200))
+MIN_RECENT_TURNS = 2
+
+# Process-wide counters so the effect of compaction can be checked after a run
+_stats_lock = threading.Lock()
+COMPACTION_STATS = {
+    "prompts": 0,
+    "full_history_tokens": 0,
+    "prompt_history_tokens": 0,
+    "summary_calls": 0,
+    "turns_folded": 0,
+}
+
+
+def _record(key: str, value: int) -> None:
+    with _stats_lock:
+        COMPACTION_STATS[key] += value
+
+
+def compaction_stats() -> dict:
+    with _stats_lock:
+        stats = dict(COMPACTION_STATS)
+    stats["tokens_saved"] = stats["full_history_tokens"] - stats["prompt_history_tokens"]
+    return stats
+
+
+def _fold(summary: str, turns) -> str:
+    """Merge newly aged-out turns into the running summary with one LLM call."""
+    prompt = f"""You maintain a running summary of a loan sales conversation between a Tata Capital loan assistant and a customer.
+
+Current summary:
+{summary or "(empty)"}
+
+New conversation turns to fold in:
+{render_history(turns)}
+
+Update the summary with the new turns. Keep every concrete fact: amounts, rates, tenures, fees,
+credit score, pre-approved limit, the customer's objections and what was offered or agreed.
+Be brief and factual. Return only the updated summary text."""
+
+    _record("summary_calls", 1)
+    _record("turns_folded", len(turns))
+    return str(llm.invoke(prompt).content).strip()
+
+
+def compact_history(state: State, keep_recent: int = KEEP_RECENT_TURNS, token_budget: int = HISTORY_TOKEN_BUDGET) -> None:
+    """
+    Fold turns older than the last `keep_recent` into state['history_summary'] once the verbatim
+    tail exceeds the token budget or twice the kept turn count. Only turns not yet folded
+    (from state['summarized_upto'] on) are sent to the summarizer.
+    """
+    history = state["history"]
+    start = state.get("summarized_upto", 0)
+    summary = state.get("history_summary", "")
+
+    recent = history[start:]
+    total = estimate_tokens(summary) + history_tokens(recent)
+    if total <= token_budget and len(recent) < 2 * keep_recent:
+        return
+
+    # Keep as many recent turns as fit the budget, but never fewer than MIN_RECENT_TURNS
+    keep = min(keep_recent, len(recent))
+    while keep > MIN_RECENT_TURNS and history_tokens(recent[-keep:]) > token_budget // 2:
+        keep -= 1
+
+    aged_out = recent[:len(recent) - keep]
+    if not aged_out:
+        return
+
+    try:
+        state["history_summary"] = _fold(summary, aged_out)
+        state["summarized_upto"] = start + len(aged_out)
+    except Exception as e:
+        print(f"[HISTORY] Summarization failed, sending full history: {e}")
+
+
+def prompt_history(state: State) -> str:
+    """Conversation text for prompts: running summary of older turns plus the recent turns verbatim."""
+    compact_history(state)
+
+    history = state["history"]
+    start = state.get("summarized_upto", 0)
+    summary = state.get("history_summary", "")
+    recent = render_history(history[start:])
+
+    text = f"Summary of earlier conversation:\n{summary}\n\nRecent conversation:\n{recent}" if summary else recent
+
+    _record("prompts", 1)
+    _record("full_history_tokens", history_tokens(history))
+    _record("prompt_history_tokens", estimate_tokens(text))
+    return text
@@ -0,0 +1,168 @@
+import re
+import threading
+from typing import Optional
+
+LOAN_TYPES = {
+    "personal": r"personal",
+    "home": r"home|housing",
+    "car": r"car|auto|vehicle",
+    "two_wheeler": r"two[- ]wheeler|bike",
+    "business": r"business|msme",
+    "education": r"education|student",
+    "gold": r"gold",
+    "top_up": r"top[- ]?up",
+    "loan_against_property": r"(?:loan )?against property|lap",
+}
+LOAN_TYPE = re.compile(
+    r"\b(" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in LOAN_TYPES.items()) + r")\s+loans?\b",
+    re.IGNORECASE,
+)
+USER_ID = re.compile(r"\b(?:user|customer)[\s_-]*id\b\D{0,10}?(\d+)", re.IGNORECASE)
+TENURE = re.compile(r"\b(\d+(?:\.\d+)?)\s*(years?|yrs?|months?|mos?)\b", re.IGNORECASE)
+AMOUNT = re.compile(
+    r"(?P<currency>₹|\brs\.?|\binr)?\s*(?P<value>\d[\d,]*(?:\.\d+)?)\s*"
+    r"(?P<unit>lakhs?|lacs?|lpa|l\b|crores?|cr\b|k\b|thousand)?",
+    re.IGNORECASE,
+)
+UNIT_MULTIPLIERS = {"lakh": 1e5, "lac": 1e5, "lpa": 1e5, "l": 1e5, "crore": 1e7, "cr": 1e7, "k": 1e3, "thousand": 1e3}
+
+# A bare number (no ₹/Rs or lakh/crore) is a loan amount only right after one of these ("loan of 500000")
+AMOUNT_BEFORE = re.compile(r"\b(loans?|borrow\w*|amount)\b(\s+(of|is|for|about|around|to))*\s*[:=]?\s*$", re.IGNORECASE)
+# A duration is a loan tenure only near one of these ("loan for 3 years", "tenure of 24 months"),
+# or when it is the whole message ("what about 3 years?"); "working here for 5 years" is not one
+TENURE_BEFORE = re.compile(r"\b(loans?|tenure|repay\w*|term|period|duration|emis?|borrow\w*)\b", re.IGNORECASE)
+TENURE_ONLY = re.compile(
+    r"^\W*(?:(?:what|how) about|make it|for|over|maybe)?\s*\d+(?:\.\d+)?\s*(?:years?|yrs?|months?|mos?)"
+    r"(?:\s*(?:and|,)?\s*\d+\s*(?:months?|mos?))?\W*$",
+    re.IGNORECASE,
+)
+# Text between the parts of one duration ("2 years 6 months", "2 years and 6 months")
+TENURE_JOIN = re.compile(r"^\s*(?:and|,)?\s*$", re.IGNORECASE)
+TENURE_WINDOW = 40
+# Amounts the customer already pays are obligations, not the loan they want
+OBLIGATION_AFTER = re.compile(r"^\s*(rupees\s+)?(emis?|instal+ments?)\b", re.IGNORECASE)
+# First-person statements can carry details the extractor does not model ("I work in IT")
+SELF_STATEMENT = re.compile(r"\b(i|i'm|im|i've|my|we|our)\b", re.IGNORECASE)
+
+INCOME_BEFORE = re.compile(r"(earn\w*|salary|income|pension|take[- ]home|make|paid)\D{0,25}$", re.IGNORECASE)
+MONTHLY_AFTER = re.compile(r"^\s*(per month|a month|monthly|/\s*month|pm\b|p\.m\.)", re.IGNORECASE)
+ANNUAL = re.compile(r"^\s*(per annum|a year|annually|yearly|p\.a\.|/\s*year)|lpa", re.IGNORECASE)
+
+# Details the extractor does not model; their presence sends the message to the LLM
+UNMODELLED = re.compile(
+    r"\b(my name|name is|call me|years old|\bage\b|work (at|for|as|in)|working|employ\w*|self[- ]employed|freelanc\w*|"
+    r"phone|mobile|email|already pay\w*|"
+    r"property|house (is )?(worth|valued)|valued at|remaining|outstanding|existing loan|current loan|"
+    r"emi of|city|live in|based in|from (mumbai|pune|delhi|bengaluru|bangalore|chennai|jaipur|ahmedabad))\b",
+    re.IGNORECASE,
+)
+
+_lock = threading.Lock()
+EXTRACTOR_STATS = {"local": 0, "llm": 0}
+
+
+def _count(source: str) -> None:
+    with _lock:
+        EXTRACTOR_STATS[source] += 1
+
+
+def extractor_stats() -> dict:
+    with _lock:
+        stats = dict(EXTRACTOR_STATS)
+    total = sum(stats.values())
+    stats["llm_calls_avoided"] = round(stats["local"] / total, 3) if total else 0.0
+    return stats
+
+
+def _to_number(value: str, unit: Optional[str]) -> float:
+    number = float(value.replace(",", ""))
+    if unit:
+        unit = unit.lower().rstrip("s")
+        number *= UNIT_MULTIPLIERS.get(unit, 1)
+    return number
+
+
+def extract_profile_delta(message: str) -> Optional[dict]:
+    """
+    Extract user_id, loan_type, loan_amount, loan_tenure (months) and income from a message
+    with regexes. Returns the fields found (possibly {} for greetings and questions), or None when
+    the message holds details or numbers this extractor cannot account for and the LLM should handle it.
+    Numbers count only with context: amounts need ₹/Rs, a unit or a preceding "loan"/"borrow", and
+    durations need a loan/tenure word nearby. A duration given in parts is summed; two separate
+    durations are ambiguous.
+
+    >>> extract_profile_delta("I want a loan for 2 years 6 months")
+    {'loan_tenure': 30}
+    >>> extract_profile_delta("a loan for 3 years, or maybe 5 years") is None
+    True
+    """
+    if UNMODELLED.search(message):
+        return None
+
+    delta = {}
+    consumed = []
+
+    for match in USER_ID.finditer(message):
+        delta["user_id"] = int(match.group(1))
+        consumed.append(match.span(1))
+
+    for match in LOAN_TYPE.finditer(message):
+        delta["loan_type"] = next(name for name in LOAN_TYPES if match.group(name))
+
+    tenure, previous = None, None  # previous: (end, was in years) of the last duration part
+    for match in TENURE.finditer(message):
+        in_years = match.group(2).lower().startswith("y")
+        months = float(match.group(1)) * (12 if in_years else 1)
+        if previous and previous[1] and not in_years and TENURE_JOIN.match(message[previous[0]:match.start()]):
+            tenure += months
+        else:
+            before = message[max(0, match.start() - TENURE_WINDOW):match.start()]
+            if tenure is not None or not (TENURE_BEFORE.search(before) or TENURE_ONLY.match(message)):
+                return None
+            tenure = months
+        previous = (match.end(), in_years)
+        consumed.append(match.span(1))
+    if tenure is not None:
+        delta["loan_tenure"] = int(round(tenure))
+
+    for match in AMOUNT.finditer(message):
+        span = match.span("value")
+        if any(start <= span[0] < end for start, end in consumed):
+            continue
+        after = message[match.end():]
+        if after.lstrip().startswith("%"):
+            return None
+        if OBLIGATION_AFTER.match(after):
+            return None
+        amount = _to_number(match.group("value"), match.group("unit"))
+        before = message[:match.start()]
+        is_income = INCOME_BEFORE.search(before) or MONTHLY_AFTER.match(after)
+        marked = match.group("currency") or match.group("unit")
+        if not marked and (amount < 1000 or not (is_income or AMOUNT_BEFORE.search(before))):
+            # A bare number we can't interpret (year, phone number, age, count...)
+            return None
+
+        if is_income:
+            unit = (match.group("unit") or "").lower()
+            key = "annual_income" if unit == "lpa" or ANNUAL.match(after) else "income"
+            delta[key] = int(amount)
+        elif "loan_amount" in delta:
+            # Two loan-looking amounts in one message is ambiguous
+            return None
+        else:
+            delta["loan_amount"] = int(amount)
+        consumed.append(span)
+
+    if not delta and SELF_STATEMENT.search(message):
+        return None
+    return delta
+
+
+def extract_profile(message: str, current_profile: dict) -> Optional[dict]:
+    """Merged profile when the message can be handled locally, otherwise None."""
+    delta = extract_profile_delta(message)
+    if delta is None:
+        _count("llm")
+        return None
+    _count("local")
+    return {**current_profile, **delta}
@@ -0,0 +1,350 @@
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from utils.history import estimate_tokens
+
+# Lower value = served first when callers are queued for the same provider
+PRIORITY_HIGH = 0     # customer-facing replies (sales_agent)
+PRIORITY_NORMAL = 1   # routing, extraction, search summaries
+PRIORITY_LOW = 2      # background critiques and other deferrable work
+
+MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", 4))
+BACKOFF_BASE = float(os.getenv("RATE_LIMIT_BACKOFF_BASE", 0.5))
+BACKOFF_MAX = float(os.getenv("RATE_LIMIT_BACKOFF_MAX", 20))
+EXPECTED_COMPLETION_TOKENS = 256
+
+_priority = contextvars.ContextVar("request_priority", default=PRIORITY_NORMAL)
+
+RETRYABLE_MESSAGE = re.compile(
+    r"\b429\b|rate.?limit|too many requests|timed? ?out|temporarily|connection|\b50[0234]\b", re.IGNORECASE
+)
+
+
+@contextmanager
+def request_priority(level: int):
+    """Run the enclosed provider calls (including ones on threads started with a copied context) at `level`."""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def with_priority(level: int, fn):
+    """Wrap fn so it runs at `level`, e.g. for work submitted to a thread pool."""
+    def wrapper(*args, **kwargs):
+        with request_priority(level):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+class RateLimitError(Exception):
+    """Provider call still failing after all retries."""
+
+
+def _status(error) -> int:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(error) -> bool:
+    """429s, 5xx, timeouts and connection failures are worth retrying; anything else is not."""
+    status = _status(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    return bool(RETRYABLE_MESSAGE.search(f"{type(error).__name__} {error}"))
+
+
+def is_rate_limited(error) -> bool:
+    return _status(error) == 429 or bool(re.search(r"\b429\b|rate.?limit|too many", str(error), re.IGNORECASE))
+
+
+def _retry_after(error) -> float:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute up to `per_minute`; take() may drive the level negative (debt)."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # Requests larger than the whole bucket are let through once it is full
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed / self.rate)
+
+    def take(self, amount: float) -> None:
+        self.level -= amount
+
+
+class ProviderScheduler:
+    """
+    Admission control for one provider (e.g. Groq or Tavily).
+
+    A call is admitted when it is the highest-priority waiter, the requests-per-minute and
+    tokens-per-minute buckets have room, and fewer than `concurrency` calls are in flight.
+    Concurrency adapts AIMD-style: +1/limit per success, halved on a 429. Failed calls that
+    look transient are retried with full-jitter exponential backoff (or the server's Retry-After).
+    """
+
+    def __init__(self, name: str, rpm: float, tpm: float = None, max_concurrency: int = 16,
+                 min_concurrency: int = 1, max_retries: int = MAX_RETRIES):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency = float(max_concurrency)
+        self.max_retries = max_retries
+        self.inflight = 0
+        self.counters = {"calls": 0, "retries": 0, "rate_limited": 0, "failed": 0, "wait_seconds": 0.0}
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _acquire(self, tokens: int) -> None:
+        entry = (_priority.get(), next(self._seq))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._waiters[0] == entry and self.inflight < int(self.concurrency):
+                        wait = self.requests.wait_time(1, now)
+                        if self.tokens is not None:
+                            wait = max(wait, self.tokens.wait_time(tokens, now))
+                        if wait == 0:
+                            break
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+            self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(tokens)
+            self.inflight += 1
+            self.counters["wait_seconds"] += time.monotonic() - start
+
+    def _release(self, reserved: int, used: int = None, rate_limited: bool = False) -> None:
+        with self._cond:
+            self.inflight -= 1
+            if used is not None and self.tokens is not None:
+                self.tokens.take(used - reserved)  # settle the estimate against actual usage
+            if rate_limited:
+                self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+            else:
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self._cond.notify_all()
+
+    def _count(self, key: str, amount=1) -> None:
+        with self._cond:
+            self.counters[key] += amount
+
+    def _backoff(self, attempt: int, error) -> None:
+        delay = _retry_after(error) or random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        print(f"[RATE LIMITER] {self.name} call failed ({error}); retry {attempt + 1} in {delay:.2f}s")
+        time.sleep(delay)
+
+    def _retry_after_failure(self, attempt: int, error, tokens: int) -> bool:
+        """Release a failed attempt's slot; back off and return True if it is worth another attempt."""
+        limited = is_rate_limited(error)
+        self._count("rate_limited", limited)
+        self._release(tokens, rate_limited=limited)
+        if attempt == self.max_retries or not is_retryable(error):
+            self._count("failed")
+            return False
+        self._count("retries")
+        self._backoff(attempt, error)
+        return True
+
+    def call(self, fn, tokens: int = 0, usage=None, failure=None):
+        """
+        Run fn() under this scheduler, retrying transient failures.
+
+        Args:
+            fn: The provider call.
+            tokens (int): Estimated tokens the call will consume (for the TPM bucket).
+            usage: Optional fn(result) -> actual tokens used, to correct the estimate.
+            failure: Optional fn(result) -> error object for results that signal failure without raising.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._acquire(tokens)
+            self._count("calls")
+            try:
+                result = fn()
+            except Exception as e:
+                error, result = e, None
+            else:
+                error = failure(result) if failure else None
+
+            if error is None:
+                self._release(tokens, usage(result) if usage else None)
+                return result
+
+            if not self._retry_after_failure(attempt, error, tokens):
+                if isinstance(error, Exception) and result is None:
+                    raise error
+                return result
+
+    def stream(self, open_stream, tokens: int = 0, usage=None):
+        """
+        Run a streaming call under this scheduler, yielding its chunks.
+
+        Opening the stream (up to its first chunk) is retried like call(); a failure mid-stream
+        propagates. The slot is held until the stream is exhausted or closed, and then the token
+        estimate is settled against the usage reported by the chunks (usage(chunk) -> tokens or None).
+        """
+        for attempt in range(self.max_retries + 1):
+            self._acquire(tokens)
+            self._count("calls")
+            try:
+                iterator = iter(open_stream())
+                first = next(iterator, None)
+            except Exception as e:
+                if not self._retry_after_failure(attempt, e, tokens):
+                    raise
+                continue
+            break
+
+        used, limited = None, False
+        try:
+            if first is None:
+                return
+            for chunk in itertools.chain([first], iterator):
+                chunk_usage = usage(chunk) if usage else None
+                if chunk_usage:
+                    used = (used or 0) + chunk_usage
+                yield chunk
+        except Exception as e:
+            limited = is_rate_limited(e)
+            self._count("rate_limited", limited)
+            self._count("failed")
+            raise
+        finally:
+            close = getattr(iterator, "close", None)
+            if close:
+                close()
+            self._release(tokens, used, rate_limited=limited)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {**self.counters, "inflight": self.inflight, "concurrency": round(self.concurrency, 2),
+                    "queued": len(self._waiters)}
+
+
+def _prompt_tokens(prompt) -> int:
+    if isinstance(prompt, str):
+        return estimate_tokens(prompt)
+    return sum(estimate_tokens(str(getattr(m, "content", m))) for m in prompt)
+
+
+def _usage_tokens(response) -> int:
+    usage = getattr(response, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+class RateLimitedLLM:
+    """Chat model wrapper sending every call through a ProviderScheduler."""
+
+    def __init__(self, model, scheduler: ProviderScheduler, completion_tokens: int = EXPECTED_COMPLETION_TOKENS):
+        self.model = model
+        self.scheduler = scheduler
+        self.completion_tokens = completion_tokens
+
+    def invoke(self, prompt, *args, **kwargs):
+        return self.scheduler.call(
+            lambda: self.model.invoke(prompt, *args, **kwargs),
+            tokens=_prompt_tokens(prompt) + self.completion_tokens,
+            usage=_usage_tokens,
+        )
+
+    def batch(self, prompts, config=None, return_exceptions: bool = False, **kwargs):
+        """Schedule each prompt separately (so each gets its own admission and retries), in parallel."""
+        max_workers = (config or {}).get("max_concurrency") or len(prompts) or 1
+        config = {k: v for k, v in (config or {}).items() if k != "max_concurrency"} or None
+
+        def run(prompt):
+            try:
+                return self.invoke(prompt, config=config, **kwargs)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, run, p) for p in prompts]
+            return [f.result() for f in futures]
+
+    def stream(self, prompt, *args, **kwargs):
+        # Only the opening of the stream is retried; a failure mid-stream propagates
+        return self.scheduler.stream(
+            lambda: self.model.stream(prompt, *args, **kwargs),
+            tokens=_prompt_tokens(prompt) + self.completion_tokens,
+            usage=_usage_tokens,
+        )
+
+    def with_config(self, *args, **kwargs):
+        return RateLimitedLLM(self.model.with_config(*args, **kwargs), self.scheduler, self.completion_tokens)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class RateLimitedTool:
+    """Tool wrapper (e.g. Tavily) sending every invoke through a ProviderScheduler."""
+
+    def __init__(self, tool, scheduler: ProviderScheduler):
+        self.tool = tool
+        self.scheduler = scheduler
+
+    def invoke(self, payload, *args, **kwargs):
+        # langchain_tavily reports HTTP failures as {"error": ...} instead of raising
+        return self.scheduler.call(
+            lambda: self.tool.invoke(payload, *args, **kwargs),
+            failure=lambda result: result.get("error") if isinstance(result, dict) else None,
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.tool, name)
+
+
+groq_scheduler = ProviderScheduler(
+    "groq",
+    rpm=float(os.getenv("GROQ_RPM", 30)),
+    tpm=float(os.getenv("GROQ_TPM", 6000)),
+    max_concurrency=int(os.getenv("GROQ_MAX_CONCURRENCY", 16)),
+)
+tavily_scheduler = ProviderScheduler(
+    "tavily",
+    rpm=float(os.getenv("TAVILY_RPM", 100)),
+    max_concurrency=int(os.getenv("TAVILY_MAX_CONCURRENCY", 8)),
+)
+
+
+def scheduler_stats() -> dict:
+    return {"groq": groq_scheduler.stats(), "tavily": tavily_scheduler.stats()}
@@ -0,0 +1,276 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils.clients import swap_clients
+import llm as llm_module
+import tools.tavily_tool as tavily_module
+
+TRACE_PATH = os.getenv("TRACE_PATH")  # JSONL file for span records; unset = aggregate in memory only
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_session = contextvars.ContextVar("trace_session", default=None)
+_turn = contextvars.ContextVar("trace_turn", default=None)
+_node = contextvars.ContextVar("trace_node", default=None)
+
+
+class Tracer:
+    """
+    Collects spans for graph nodes, LLM calls and search calls.
+    Each span is aggregated into per-(kind, name) metrics and optionally appended to a JSONL file.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self._file = open(path, "a") if path else None
+
+    def record(self, kind: str, name: str, duration: float, error: str = None, **fields) -> None:
+        span = {
+            "ts": round(time.time(), 3),
+            "kind": kind,
+            "name": name,
+            "session": _session.get(),
+            "turn": _turn.get(),
+            "node": _node.get(),
+            "duration_ms": round(duration * 1000, 3),
+            "error": error,
+            **fields,
+        }
+        with self._lock:
+            m = self.metrics.setdefault((kind, name), {
+                "calls": 0, "errors": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0,
+                "cache_hits": 0, "buckets": [0] * len(LATENCY_BUCKETS),
+            })
+            m["calls"] += 1
+            m["errors"] += error is not None
+            m["seconds"] += duration
+            m["prompt_tokens"] += fields.get("prompt_tokens") or 0
+            m["completion_tokens"] += fields.get("completion_tokens") or 0
+            m["cache_hits"] += bool(fields.get("cache"))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    m["buckets"][i] += 1
+            if self._file:
+                self._file.write(json.dumps(span, default=str) + "\n")
+                self._file.flush()
+
+    @contextmanager
+    def span(self, kind: str, name: str, **fields):
+        start = time.perf_counter()
+        extra = {}
+        try:
+            yield extra
+        except Exception as e:
+            self.record(kind, name, time.perf_counter() - start, error=f"{type(e).__name__}: {e}", **fields)
+            raise
+        self.record(kind, name, time.perf_counter() - start, **fields, **extra)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                f"{kind}:{name}": {k: v for k, v in m.items() if k != "buckets"}
+                for (kind, name), m in sorted(self.metrics.items())
+            }
+
+    def prometheus_text(self) -> str:
+        """Metrics in the Prometheus text exposition format, plus cache/router/gate counters."""
+        with self._lock:
+            metrics = [(f'kind="{kind}",name="{name}"', dict(m)) for (kind, name), m in sorted(self.metrics.items())]
+
+        # Each family's TYPE line is followed by all of its samples, as the format requires
+        families = {
+            "calls_total": ("counter", lambda labels, m: [f"{{{labels}}} {m['calls']}"]),
+            "errors_total": ("counter", lambda labels, m: [f"{{{labels}}} {m['errors']}"]),
+            "tokens_total": ("counter", lambda labels, m: [
+                f'{{{labels},type="prompt"}} {m["prompt_tokens"]}',
+                f'{{{labels},type="completion"}} {m["completion_tokens"]}',
+            ]),
+            "cache_hits_total": ("counter", lambda labels, m: [f"{{{labels}}} {m['cache_hits']}"]),
+            "duration_seconds": ("histogram", lambda labels, m: [
+                *(f'_bucket{{{labels},le="{bound}"}} {count}' for bound, count in zip(LATENCY_BUCKETS, m["buckets"])),
+                f'_bucket{{{labels},le="+Inf"}} {m["calls"]}',
+                f"_sum{{{labels}}} {m['seconds']:.6f}",
+                f"_count{{{labels}}} {m['calls']}",
+            ]),
+        }
+        lines = []
+        for family, (metric_type, samples) in families.items():
+            lines.append(f"# TYPE loan_assistant_{family} {metric_type}")
+            for labels, m in metrics:
+                lines.extend(f"loan_assistant_{family}{sample}" for sample in samples(labels, m))
+
+        lines.append("# TYPE loan_assistant_component gauge")
+        for component, stats in component_stats().items():
+            for key, value in stats.items():
+                if isinstance(value, (int, float)):
+                    lines.append(f'loan_assistant_component{{component="{component}",stat="{key}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+tracer = Tracer(TRACE_PATH)
+
+
+def component_stats() -> dict:
+    """Counters kept by the caches, local router/extractor, quality gate and history compaction."""
+    from tools.tavily_tool import search_cache
+    from tools.query_index import query_index
+    from agents.search_agent import search_stats
+    from tools.product_facts import facts_stats
+    from tools.bureau_client import bureau_client
+    from agents.router import router_stats
+    from agents.quality_gate import gate_stats
+    from utils.profile_extractor import extractor_stats
+    from utils.history_summary import compaction_stats
+    from utils.rate_limiter import scheduler_stats
+
+    return {
+        "search_cache": search_cache.stats(),
+        "query_index": query_index.stats(),
+        "search_backend": search_stats(),
+        "product_facts": facts_stats(),
+        "llm_cache": llm_module.cached_llm.stats(),
+        "bureau": bureau_client.stats(),
+        "router": router_stats(),
+        "profile_extractor": extractor_stats(),
+        "quality_gate": gate_stats(),
+        "history_compaction": compaction_stats(),
+        **{f"scheduler_{name}": stats for name, stats in scheduler_stats().items()},
+    }
+
+
+def traced_node(name: str, fn):
+    """Wrap a graph node so its wall time and errors are recorded with the session and turn."""
+    @functools.wraps(fn)
+    def wrapper(state):
+        tokens = (_session.set(state.get("session_id")), _turn.set(state.get("count", 0)), _node.set(name))
+        try:
+            with tracer.span("node", name):
+                return fn(state)
+        finally:
+            _node.reset(tokens[2])
+            _turn.reset(tokens[1])
+            _session.reset(tokens[0])
+    return wrapper
+
+
+def _usage(response) -> dict:
+    usage = getattr(response, "usage_metadata", None) or {}
+    metadata = getattr(response, "response_metadata", None) or {}
+    return {
+        "prompt_tokens": usage.get("input_tokens", 0),
+        "completion_tokens": usage.get("output_tokens", 0),
+        "cache": metadata.get("cache"),
+    }
+
+
+class TracedLLM:
+    """Chat model wrapper recording a span for every invoke/batch/stream call."""
+
+    def __init__(self, model, channel: str):
+        self.model = model
+        self.channel = channel
+
+    def invoke(self, prompt, *args, **kwargs):
+        with tracer.span("llm", self.channel) as extra:
+            response = self.model.invoke(prompt, *args, **kwargs)
+            extra.update(_usage(response))
+        return response
+
+    def batch(self, prompts, *args, **kwargs):
+        with tracer.span("llm", f"{self.channel}.batch", size=len(prompts)) as extra:
+            responses = self.model.batch(prompts, *args, **kwargs)
+            usages = [_usage(r) for r in responses if not isinstance(r, Exception)]
+            extra["prompt_tokens"] = sum(u["prompt_tokens"] for u in usages)
+            extra["completion_tokens"] = sum(u["completion_tokens"] for u in usages)
+        return responses
+
+    def stream(self, prompt, *args, **kwargs):
+        start = time.perf_counter()
+        first_token = None
+        last = None
+        try:
+            for chunk in self.model.stream(prompt, *args, **kwargs):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                last = chunk if last is None else last + chunk
+                yield chunk
+        except Exception as e:
+            tracer.record("llm", f"{self.channel}.stream", time.perf_counter() - start, error=f"{type(e).__name__}: {e}")
+            raise
+        tracer.record("llm", f"{self.channel}.stream", time.perf_counter() - start,
+                      first_token_ms=round((first_token or 0) * 1000, 3), **_usage(last))
+
+    def with_config(self, *args, **kwargs):
+        return TracedLLM(self.model.with_config(*args, **kwargs), self.channel)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class TracedSearch:
+    """Search tool wrapper recording a span for every live search."""
+
+    def __init__(self, tool):
+        self.tool = tool
+
+    def invoke(self, payload, *args, **kwargs):
+        with tracer.span("search", "tavily"):
+            return self.tool.invoke(payload, *args, **kwargs)
+
+
+@contextmanager
+def trace_clients():
+    """
+    Trace every LLM, search and bureau call made by the agents.
+    Wraps whatever clients are currently installed, so it composes with cassette_mode and the benchmark fakes.
+    """
+    import agents.agents as agents_module
+    from tools.bureau_client import bureau_client
+
+    fetch = bureau_client.fetch
+
+    def traced_fetch(user_id):
+        with tracer.span("tool", "bureau"):
+            return fetch(user_id)
+
+    bureau_client.fetch = traced_fetch
+    try:
+        with swap_clients(
+            llm=TracedLLM(agents_module.llm, "llm"),
+            cached_llm=TracedLLM(agents_module.cached_llm, "cached_llm"),
+            search=TracedSearch(tavily_module.tavily_tool),
+        ):
+            yield tracer
+    finally:
+        del bureau_client.fetch
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = tracer.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Expose tracer.prometheus_text() at http://host:port/metrics on a background thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
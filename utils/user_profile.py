@@ -1,12 +1,25 @@
 import re
 import json
-from llm import llm
+from llm import cached_llm
+from utils.profile_extractor import extract_profile
 
 def update_user_profile(latest_message: str, current_profile: dict) -> dict:
     """
-    Update the user profile based on the latest message using LLM.
+    Update the user profile based on the latest message.
+    Common fields are extracted locally; the LLM is only called for messages the extractor can't parse.
     """
+    local_profile = extract_profile(latest_message, current_profile)
+    if local_profile is not None:
+        print("Updated profile (local): ", json.dumps(local_profile, ensure_ascii=False), "\n")
+        return local_profile
+
+    return llm_update_user_profile(latest_message, current_profile)
+
 
+def llm_update_user_profile(latest_message: str, current_profile: dict) -> dict:
+    """
+    Update the user profile based on the latest message using LLM.
+    """
     if len(current_profile) == 0:
         prompt = f"""
     You are an expert at creating user profiles for loan applications based on conversation history.
@@ -70,7 +83,7 @@ def update_user_profile(latest_message: str, current_profile: dict) -> dict:
 
     """
 
-    response = llm.invoke(prompt)
+    response = cached_llm.invoke(prompt)
     text = str(response.content)
     match = re.search(r"\{.*\}", text, re.DOTALL)
 